@@ -1,33 +1,46 @@
 import os
 from dotenv import load_dotenv
 import yaml
-from typing import Dict, TypedDict, List, Optional
-from langchain_community.vectorstores import TiDBVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+import asyncio
+import operator
+from typing import Annotated, AsyncIterator, Dict, Iterator, TypedDict, List, Optional
+from langchain_core.vectorstores import VectorStoreRetriever
 from langchain.prompts import ChatPromptTemplate, PromptTemplate
 from langchain_community.tools import DuckDuckGoSearchRun
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 import json
-import atexit
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as StageTimeout
 from sqlalchemy.exc import OperationalError
+from clients import get_clients
+from answer_cache import SemanticAnswerCache, answer_scope
+from player_intent import PlayerIntent, get_intent_classifier
+from context_packer import ContextPacker
+from search_cache import CachedSearch
+from keyword_index import get_keyword_index, reciprocal_rank_fusion
 
 # Load environment variables
 load_dotenv()
 
+# Retrieval branches run concurrently; each returns its own contexts and the reducer concatenates them
 class AgentState(TypedDict):
     question: str
-    contexts: List[Dict]
+    contexts: Annotated[List[Dict], operator.add]
     final_answer: str
 
+# Order contexts are merged in, independent of which branch finished first
+CONTEXT_SOURCES = ['article', 'player', 'web']
+SOURCE_LABELS = {'article': 'Article retrieval', 'player': 'Player retrieval', 'web': 'Web search'}
+
 class NFLFantasyQA:
     def __init__(self, config_path='static/config.yml'):
         with open(config_path, 'r') as file:
             self.config = yaml.safe_load(file)
         
-        self.tidb_connection_string = os.getenv('TIDB_CONNECTION_URL')
-        self.google_api_key = os.getenv('GOOGLE_API_KEY')
+        # Engines, chat models and embeddings are owned by the shared registry, which closes them at exit
+        self.clients = get_clients()
         
         # Initialize these as None, they'll be created when first accessed
         self._article_retriever = None
@@ -36,13 +49,32 @@ class NFLFantasyQA:
         self._player_classifier = None
         self._llm = None
         self._agent = None
-        
-        logging.basicConfig(level=logging.DEBUG)
+        self._retrieval_agent = None
+        self._answer_chain = None
+        answer_cache_config = dict(self.config['answer_cache'])
+        self.answer_cache = SemanticAnswerCache(**answer_cache_config) if answer_cache_config.pop('enabled') else None
+        self.context_packer = ContextPacker(**self.config['context_packing'])
+        self.deadlines = self.config['deadlines']
+        self.keyword_config = self.config['keyword_index']
+        # Each retrieval stage has its own bounded pool so a request can stop waiting on it. A call past its
+        # deadline cannot be interrupted and keeps its thread until it returns, so a slow search provider
+        # only ties up the web pool; the article and player stages keep theirs
+        self.stage_workers = self.config['stage_workers']
+        self._stage_executors = {
+            source: ThreadPoolExecutor(max_workers=self.stage_workers[source], thread_name_prefix=f'qa-{source}')
+            for source in CONTEXT_SOURCES
+        }
+        self._stage_lock = threading.Lock()
+        self._stage_in_flight = {source: 0 for source in CONTEXT_SOURCES}
+        self._stage_counts = {source: {'calls': 0, 'timeouts': 0, 'skipped': 0} for source in CONTEXT_SOURCES}
+
         self.logger = logging.getLogger(__name__)
-        
-        # Register cleanup method
-        atexit.register(self.cleanup)
     
+    @property
+    def embeddings(self):
+        # Shared across retrievers: the article and player searches embed the same question once
+        return self.clients.embeddings
+
     @property
     def article_retriever(self):
         if self._article_retriever is None:
@@ -61,18 +93,17 @@ class NFLFantasyQA:
     def search_tool(self):
         if self._search_tool is None:
             self.logger.info("Initializing search tool")
-            self._search_tool = DuckDuckGoSearchRun()
+            # Repeated questions reuse results shared with the report bots instead of hitting DuckDuckGo again
+            self._search_tool = CachedSearch(DuckDuckGoSearchRun(), **self.config['search_cache'])
         return self._search_tool
 
     @property
     def player_classifier(self):
         if self._player_classifier is None:
             self.logger.info("Initializing player classifier")
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-001",
+            llm = self.clients.chat_model(
                 temperature=0.1,
                 top_p=0.95,
-                google_api_key=self.google_api_key,
                 generation_config={"response_mime_type": "application/json"}
             )
             prompt = ChatPromptTemplate.from_template(
@@ -93,190 +124,324 @@ class NFLFantasyQA:
     def llm(self):
         if self._llm is None:
             self.logger.info("Initializing LLM")
-            self._llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-001",
-                temperature=0.3,
-                top_p=0.95,
-                google_api_key=self.google_api_key
-            )
+            self._llm = self.clients.chat_model(temperature=0.3, top_p=0.95, timeout=self.deadlines['answer'])
         return self._llm
 
     @property
     def agent(self):
         if self._agent is None:
             self.logger.info("Creating NFL Fantasy Football Agent")
-            workflow = StateGraph(AgentState)
+            self._agent = self.build_graph(with_answer=True)
+        return self._agent
 
-            workflow.add_node("get_article_context", self.get_article_context)
-            workflow.add_node("get_player_context", self.get_player_context)
-            workflow.add_node("search_web", self.search_web)
+    @property
+    def retrieval_agent(self):
+        # Retrieval-only graph for streaming: the answer is generated outside it so tokens can be forwarded
+        if self._retrieval_agent is None:
+            self.logger.info("Creating NFL Fantasy Football retrieval graph")
+            self._retrieval_agent = self.build_graph(with_answer=False)
+        return self._retrieval_agent
+
+    def build_graph(self, with_answer: bool = True):
+        workflow = StateGraph(AgentState)
+
+        workflow.add_node("get_article_context", self.with_deadline('article', self.get_article_context))
+        workflow.add_node("get_player_context", self.with_deadline('player', self.get_player_context))
+        workflow.add_node("search_web", self.with_deadline('web', self.search_web))
+
+        # Fan out to the three independent retrieval branches, join before generating
+        retrieval_nodes = ["get_article_context", "get_player_context", "search_web"]
+        for node in retrieval_nodes:
+            workflow.add_edge(START, node)
+        if with_answer:
             workflow.add_node("generate_answer", self.generate_answer)
-
-            workflow.set_entry_point("get_article_context")
-            workflow.add_edge("get_article_context", "get_player_context")
-            workflow.add_edge("get_player_context", "search_web")
-            workflow.add_edge("search_web", "generate_answer")
+            workflow.add_edge(retrieval_nodes, "generate_answer")
             workflow.add_edge("generate_answer", END)
-
-            self._agent = workflow.compile()
-        return self._agent
-
-    def create_retriever(self, table_name: str, k: int = 5, search_kwargs: Optional[Dict] = None) -> TiDBVectorStore:
+        else:
+            for node in retrieval_nodes:
+                workflow.add_edge(node, END)
+
+        return workflow.compile()
+
+    def with_deadline(self, source: str, node):
+        # A branch that misses its deadline contributes a failure notice instead of holding up the answer.
+        # The late call is abandoned, not stopped: it runs to completion and its result is discarded.
+        timeout = self.deadlines[source]
+        executor = self._stage_executors[source]
+
+        def finished(_future):
+            with self._stage_lock:
+                self._stage_in_flight[source] -= 1
+
+        def skipped(reason: str) -> Dict:
+            return {"contexts": [{"source": source, "content": f"{SOURCE_LABELS[source]} {reason}.", "failed": True}]}
+
+        def run(state: AgentState) -> Dict:
+            with self._stage_lock:
+                self._stage_counts[source]['calls'] += 1
+                # Every worker still busy with abandoned calls: skip now rather than queue past the deadline
+                if self._stage_in_flight[source] >= self.stage_workers[source]:
+                    self._stage_counts[source]['skipped'] += 1
+                    busy = True
+                else:
+                    self._stage_in_flight[source] += 1
+                    busy = False
+            if busy:
+                self.logger.warning(f"{source} stage has no free worker; answering without it")
+                return skipped("was skipped because earlier calls are still running")
+
+            future = executor.submit(node, state)
+            future.add_done_callback(finished)
+            try:
+                return future.result(timeout=timeout)
+            except StageTimeout:
+                with self._stage_lock:
+                    self._stage_counts[source]['timeouts'] += 1
+                self.logger.warning(f"{source} stage missed its {timeout}s deadline; answering without it")
+                return skipped(f"timed out after {timeout} seconds and was skipped")
+
+        return run
+
+    def stage_stats(self) -> Dict:
+        stats = {}
+        with self._stage_lock:
+            for source, counts in self._stage_counts.items():
+                rate = counts['timeouts'] / counts['calls'] if counts['calls'] else 0.0
+                stats[source] = dict(counts, timeout_rate=round(rate, 4), deadline=self.deadlines[source],
+                                     in_flight=self._stage_in_flight[source], workers=self.stage_workers[source])
+        return stats
+
+    def create_retriever(self, table_name: str, k: int = 5, search_kwargs: Optional[Dict] = None) -> VectorStoreRetriever:
         self.logger.info(f"Creating retriever for table: {table_name}")
-        embeddings = GoogleGenerativeAIEmbeddings(model=self.config['EMBEDDING_MODEL'], google_api_key=self.google_api_key)
-        vector_store = TiDBVectorStore.from_existing_vector_table(
-            embedding=embeddings,
-            connection_string=self.tidb_connection_string,
-            table_name=table_name
-        )
+        vector_store = self.clients.vector_store(table_name)
         if search_kwargs is None:
             search_kwargs = {}
         search_kwargs["k"] = k
         return vector_store.as_retriever(search_kwargs=search_kwargs)
 
-    def get_article_context(self, state: AgentState) -> AgentState:
+    def keyword_index(self, table_name: str):
+        if not self.keyword_config['enabled']:
+            return None
+        index = get_keyword_index(table_name, self.keyword_config['index_dir'])
+        return index if index.available else None
+
+    def hybrid_search(self, retriever: VectorStoreRetriever, table_name: str, question: str,
+                      metadata_filter: Optional[Dict] = None, k: Optional[int] = None, name_only: bool = False):
+        # BM25 is exact on names and needs no embedding call; vector search covers paraphrases.
+        # Bare name lookups stop at the keyword hits, everything else merges both by reciprocal rank
+        k = k or retriever.search_kwargs["k"]
+        keyword_index = self.keyword_index(table_name)
+        keyword_docs = keyword_index.search(question, k=k, filter=metadata_filter) if keyword_index else []
+        if name_only and keyword_docs:
+            self.logger.debug(f"Keyword-only lookup on {table_name}: {len(keyword_docs)} hit(s)")
+            return keyword_docs
+        if metadata_filter:
+            vector_docs = retriever.vectorstore.similarity_search(question, k=k, filter=metadata_filter)
+        else:
+            vector_docs = retriever.invoke(question)
+        if not keyword_docs:
+            return vector_docs
+        return reciprocal_rank_fusion([vector_docs, keyword_docs], k=self.keyword_config['rrf_k'], limit=k)
+
+    def get_article_context(self, state: AgentState) -> Dict:
         self.logger.info("Getting article context")
+        contexts = []
         try:
-            docs = self.article_retriever.invoke(state["question"])
-            state["contexts"].extend([{"source": "article", "content": doc.page_content} for doc in docs])
+            intent = get_intent_classifier().classify(state["question"])
+            docs = self.hybrid_search(self.article_retriever, self.config['vectordb']['article'],
+                                      state["question"], name_only=intent["name_only"])
+            contexts.extend([{"source": "article", "content": doc.page_content, "rank": rank}
+                             for rank, doc in enumerate(docs)])
             self.logger.debug(f"Retrieved {len(docs)} article(s)")
         except OperationalError as e:
             self.logger.error(f"Database connection error: {str(e)}")
-            state["contexts"].append({
+            contexts.append({
                 "source": "article",
-                "content": "Unable to retrieve article context due to a database connection issue."
+                "content": "Unable to retrieve article context due to a database connection issue.",
+                "failed": True
             })
         except Exception as e:
             self.logger.error(f"Unexpected error in get_article_context: {str(e)}")
-            state["contexts"].append({
+            contexts.append({
                 "source": "article",
-                "content": "An unexpected error occurred while retrieving article context."
+                "content": "An unexpected error occurred while retrieving article context.",
+                "failed": True
             })
-        return state
+        return {"contexts": contexts}
+
+    def classify_with_llm(self, question: str) -> bool:
+        response = self.player_classifier.invoke({"question": question})
+        self.logger.debug(f"Raw response: {response}")
+
+        needs_player_info = False
+        if isinstance(response, dict):
+            needs_player_info = response.get("needs_player_info", False)
+        elif hasattr(response, 'content'):
+            json_match = re.search(r'```json\s*(.*?)\s*```', response.content, re.DOTALL)
+            if json_match:
+                try:
+                    response_json = json.loads(json_match.group(1))
+                    needs_player_info = response_json.get("needs_player_info", False)
+                except json.JSONDecodeError:
+                    self.logger.error("Failed to parse JSON from response")
+            else:
+                self.logger.warning("No JSON found in the response")
+        else:
+            self.logger.warning("Unexpected response format")
+        return needs_player_info
+
+    def retrieve_players(self, question: str, intent: PlayerIntent):
+        # Named players or teams narrow the search to their own outlooks, unless the question also names
+        # someone the classifier could not resolve; filtering to the resolved half would drop the other
+        if intent["unresolved_names"]:
+            return self.hybrid_search(self.player_retriever, self.config['vectordb']['playerreport'], question)
+        if intent["player_names"]:
+            metadata_filter = {"player": {"$in": intent["player_names"]}}
+            k = max(2, len(intent["player_names"]))
+        elif intent["teams"]:
+            metadata_filter = {"team": {"$in": intent["teams"]}}
+            k = 2
+        else:
+            return self.hybrid_search(self.player_retriever, self.config['vectordb']['playerreport'], question)
+        docs = self.hybrid_search(self.player_retriever, self.config['vectordb']['playerreport'], question,
+                                  metadata_filter=metadata_filter, k=k, name_only=intent["name_only"])
+        return docs or self.player_retriever.invoke(question)
 
-    def get_player_context(self, state: AgentState) -> AgentState:
+    def get_player_context(self, state: AgentState) -> Dict:
         self.logger.info("Checking if player context is needed")
+        contexts = []
         try:
-            response = self.player_classifier.invoke({"question": state["question"]})
-            self.logger.debug(f"Raw response: {response}")
-
-            needs_player_info = False
-            if isinstance(response, dict):
-                needs_player_info = response.get("needs_player_info", False)
-            elif hasattr(response, 'content'):
-                json_match = re.search(r'```json\s*(.*?)\s*```', response.content, re.DOTALL)
-                if json_match:
-                    try:
-                        response_json = json.loads(json_match.group(1))
-                        needs_player_info = response_json.get("needs_player_info", False)
-                    except json.JSONDecodeError:
-                        self.logger.error("Failed to parse JSON from response")
-                else:
-                    self.logger.warning("No JSON found in the response")
-            else:
-                self.logger.warning("Unexpected response format")
+            # The local gazetteer settles most questions; only ambiguous ones cost an LLM round trip
+            intent = get_intent_classifier().classify(state["question"])
+            self.logger.debug(f"Local player intent: {intent}")
+            needs_player_info = intent["needs_player_info"]
+            if needs_player_info is None:
+                needs_player_info = self.classify_with_llm(state["question"])
 
             self.logger.info(f"Needs player info: {needs_player_info}")
 
             if needs_player_info:
                 self.logger.info("Getting player context")
                 try:
-                    docs = self.player_retriever.invoke(state["question"])
-                    state["contexts"].extend([{"source": "player", "content": doc.page_content} for doc in docs])
+                    docs = self.retrieve_players(state["question"], intent)
+                    contexts.extend([{"source": "player", "content": doc.page_content, "rank": rank}
+                                     for rank, doc in enumerate(docs)])
                     self.logger.debug(f"Retrieved {len(docs)} player document(s)")
                 except OperationalError as e:
                     self.logger.error(f"Database connection error: {str(e)}")
-                    state["contexts"].append({
+                    contexts.append({
                         "source": "player",
-                        "content": "Unable to retrieve player context due to a database connection issue."
+                        "content": "Unable to retrieve player context due to a database connection issue.",
+                        "failed": True
                     })
                 except Exception as e:
                     self.logger.error(f"Unexpected error in get_player_context: {str(e)}")
-                    state["contexts"].append({
+                    contexts.append({
                         "source": "player",
-                        "content": "An unexpected error occurred while retrieving player context."
+                        "content": "An unexpected error occurred while retrieving player context.",
+                        "failed": True
                     })
         except Exception as e:
             self.logger.error(f"Error in player classification: {str(e)}")
-            state["contexts"].append({
+            contexts.append({
                 "source": "player",
-                "content": "Unable to determine if player context is needed due to an error."
+                "content": "Unable to determine if player context is needed due to an error.",
+                "failed": True
             })
-        return state
+        return {"contexts": contexts}
 
-    def search_web(self, state: AgentState) -> AgentState:
+    def search_web(self, state: AgentState) -> Dict:
         self.logger.info("Searching the web")
+        contexts = []
         try:
             search_results = self.search_tool.run(state["question"])
-            state["contexts"].append({"source": "web", "content": search_results})
+            contexts.append({"source": "web", "content": search_results})
             self.logger.debug("Web search completed")
         except Exception as e:
             self.logger.error(f"Web search failed: {str(e)}")
-            state["contexts"].append({
+            contexts.append({
                 "source": "web",
-                "content": "Web search failed. Using only provided context for answering."
+                "content": "Web search failed. Using only provided context for answering.",
+                "failed": True
             })
-        return state
+        return {"contexts": contexts}
 
-    def generate_answer(self, state: AgentState) -> AgentState:
+    def generate_answer(self, state: AgentState) -> Dict:
         self.logger.info("Generating final answer")
-        article_context = "\n".join([f"Content: {ctx['content']}" for ctx in state["contexts"] if ctx['source'] == 'article'])
-        player_context = "\n".join([f"Content: {ctx['content']}" for ctx in state["contexts"] if ctx['source'] == 'player'])
-        web_context = "\n".join([f"Content: {ctx['content']}" for ctx in state["contexts"] if ctx['source'] == 'web'])
-        
-        self.logger.debug(f"Article context length: {len(article_context)}")
-        self.logger.debug(f"Player context length: {len(player_context)}")
-        self.logger.debug(f"Web context length: {len(web_context)}")
+        response = self.answer_chain.invoke(self.answer_inputs(state))
+        return {"final_answer": self.finalize_answer(response)}
 
-        prompt_template = """You are an NFL Fantasy Football expert. Use the following pieces of context to answer the user's question.
+    @property
+    def answer_chain(self):
+        if self._answer_chain is None:
+            prompt_template = """You are an NFL Fantasy Football expert. Use the following pieces of context to answer the user's question.
 
-        Article Context: This context provides general information about NFL teams, players, and fantasy football strategies from various articles.
-        {article_context}
+            Article Context: This context provides general information about NFL teams, players, and fantasy football strategies from various articles.
+            {article_context}
 
-        Player Context: This context provides specific information about individual NFL players, including their stats, team, position, and fantasy relevance.
-        {player_context}
+            Player Context: This context provides specific information about individual NFL players, including their stats, team, position, and fantasy relevance.
+            {player_context}
 
-        Web Search Context: This context provides additional, potentially more recent information from web searches about NFL players, teams, and fantasy football trends.
-        {web_context}
+            Web Search Context: This context provides additional, potentially more recent information from web searches about NFL players, teams, and fantasy football trends.
+            {web_context}
 
-        Question: {question}
+            Question: {question}
 
-        If the user asks about a specific player, provide a detailed report on the player as long as it is from the given contexts, including:
-        1. Current team and position
-        2. Key stats from the previous season
-        3. Fantasy football outlook and ranking
-        4. Any recent news or developments (injuries, team changes, etc.)
-        5. Comparison to other players in the same position
+            If the user asks about a specific player, provide a detailed report on the player as long as it is from the given contexts, including:
+            1. Current team and position
+            2. Key stats from the previous season
+            3. Fantasy football outlook and ranking
+            4. Any recent news or developments (injuries, team changes, etc.)
+            5. Comparison to other players in the same position
 
-        If you don't have enough information to answer comprehensively, state what information is missing. Do Not make up answers.
+            If you don't have enough information to answer comprehensively, state what information is missing. Do Not make up answers.
 
-        If any of the contexts indicate a failure in retrieval (e.g., database connection issues), mention this in your response and explain that the answer might be limited or less current due to these technical difficulties.
+            If any of the contexts indicate a failure in retrieval (e.g., database connection issues), mention this in your response and explain that the answer might be limited or less current due to these technical difficulties.
 
-        **The output should be created in a markdown format.** Even though the content is in markdown format, use numbered lists where appropriate.
-        At the end of your response, always include a list of references used to create the answer, formatted as:
+            **The output should be created in a markdown format.** Even though the content is in markdown format, use numbered lists where appropriate.
+            At the end of your response, always include a list of references used to create the answer, formatted as:
 
-        References:
-        1. [Title 1](URL 1)
-        2. [Title 2](URL 2)
-        ...
+            References:
+            1. [Title 1](URL 1)
+            2. [Title 2](URL 2)
+            ...
 
-        If no specific references were used, include a note stating that the information is based on general knowledge and the provided context.
-        """
+            If no specific references were used, include a note stating that the information is based on general knowledge and the provided context.
+            """
 
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["article_context", "player_context", "web_context", "question"]
-        )
+            PROMPT = PromptTemplate(
+                template=prompt_template,
+                input_variables=["article_context", "player_context", "web_context", "question"]
+            )
 
-        chain = PROMPT | self.llm
+            self._answer_chain = PROMPT | self.llm
+        return self._answer_chain
+
+    def answer_inputs(self, state: AgentState) -> Dict:
+        # Stable sort keeps each branch's own ordering while fixing the order across branches
+        contexts = sorted(state["contexts"], key=lambda ctx: CONTEXT_SOURCES.index(ctx["source"]))
+        contexts, report = self.context_packer.pack(contexts)
+        self.logger.info(
+            f"Context packed {report['input_tokens']} -> {report['packed_tokens']} tokens "
+            f"({report['duplicates_removed']} duplicate, {report['passages_dropped']} dropped, "
+            f"{report['passages_truncated']} truncated)"
+        )
+        article_context = "\n".join([f"Content: {ctx['content']}" for ctx in contexts if ctx['source'] == 'article'])
+        player_context = "\n".join([f"Content: {ctx['content']}" for ctx in contexts if ctx['source'] == 'player'])
+        web_context = "\n".join([f"Content: {ctx['content']}" for ctx in contexts if ctx['source'] == 'web'])
+        
+        self.logger.debug(f"Article context length: {len(article_context)}")
+        self.logger.debug(f"Player context length: {len(player_context)}")
+        self.logger.debug(f"Web context length: {len(web_context)}")
 
-        response = chain.invoke({
+        return {
             "article_context": article_context,
             "player_context": player_context,
             "web_context": web_context,
             "question": state["question"]
-        })
+        }
 
+    def finalize_answer(self, response) -> str:
         # Ensure the response is in markdown format
         if isinstance(response, str):
             markdown_response = response
@@ -302,45 +467,98 @@ class NFLFantasyQA:
         else:
             markdown_response = f"{content}\n\n## References\nNo specific sources cited. Information synthesized from provided context and expert knowledge."
 
-        state["final_answer"] = markdown_response
-        return state
+        return markdown_response
+
+    def stream_answer(self, question: str) -> Iterator[str]:
+        # Same pipeline as get_answer, but the final LLM call streams its tokens to the caller
+        self.logger.info(f"Received question (streaming): {question}")
+        cached_answer, cache_key = self.lookup_cached_answer(question)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        state = self.retrieval_agent.invoke(AgentState(question=question, contexts=[], final_answer=""))
+        self.logger.info("Streaming final answer")
+        parts = []
+        for chunk in self.answer_chain.stream(self.answer_inputs(state)):
+            text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if text:
+                parts.append(text)
+                yield text
+        self.logger.info("Answer generated")
+        self.cache_answer(question, cache_key, self.finalize_answer("".join(parts)), state["contexts"])
+
+    async def astream_answer(self, question: str) -> AsyncIterator[str]:
+        # Async twin of stream_answer for the ASGI server. Blocking work (the retrieval nodes, embedding
+        # lookups) runs in the event loop's bounded default executor; the final LLM call streams natively.
+        self.logger.info(f"Received question (async streaming): {question}")
+        loop = asyncio.get_running_loop()
+        cached_answer, cache_key = await loop.run_in_executor(None, self.lookup_cached_answer, question)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+
+        state = await self.retrieval_agent.ainvoke(AgentState(question=question, contexts=[], final_answer=""))
+        self.logger.info("Streaming final answer")
+        parts = []
+        async for chunk in self.answer_chain.astream(self.answer_inputs(state)):
+            text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if text:
+                parts.append(text)
+                yield text
+        self.logger.info("Answer generated")
+        await loop.run_in_executor(None, self.cache_answer, question, cache_key,
+                                   self.finalize_answer("".join(parts)), state["contexts"])
+
+    def lookup_cached_answer(self, question: str):
+        # Returns (cached_answer, cache_key). The key pairs the question vector, which the retrievers reuse
+        # via the embedding cache, with the players, teams and positions the question is about. Bare name
+        # lookups skip the cache: the keyword index answers them without an embedding call, and the cache
+        # lookup would cost one.
+        if self.answer_cache is None:
+            return None, None
+        try:
+            intent = get_intent_classifier().classify(question)
+            if intent["name_only"]:
+                return None, None
+            scope = answer_scope(intent)
+            question_vector = self.embeddings.embed_query(question)
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup skipped: {str(e)}")
+            return None, None
+        return self.answer_cache.lookup(question_vector, scope), (question_vector, scope)
+
+    def cache_answer(self, question: str, cache_key, answer: str, contexts: List[Dict]):
+        # Answers built around a failed retrieval are not worth replaying
+        if cache_key is None or any(ctx.get("failed") for ctx in contexts):
+            return
+        question_vector, scope = cache_key
+        self.answer_cache.store(question_vector, question, answer, scope)
 
     def get_answer(self, question: str) -> str:
         self.logger.info(f"Received question: {question}")
+        cached_answer, cache_key = self.lookup_cached_answer(question)
+        if cached_answer is not None:
+            return cached_answer
+
         initial_state = AgentState(question=question, contexts=[], final_answer="")
         result = self.agent.invoke(initial_state)
         self.logger.info("Answer generated")
         if isinstance(result["final_answer"], str):
-            return result["final_answer"]
+            answer = result["final_answer"]
         elif hasattr(result["final_answer"], 'content'):
-            return result["final_answer"].content
+            answer = result["final_answer"].content
         else:
-            return str(result["final_answer"])
+            answer = str(result["final_answer"])
+        self.cache_answer(question, cache_key, answer, result["contexts"])
+        return answer
 
     def cleanup(self):
+        # Connection pools belong to the shared registry; dropping the retrievers leaves nothing else open
         self.logger.info("Cleaning up resources...")
-        for retriever_name in ['_article_retriever', '_player_retriever']:
-            retriever = getattr(self, retriever_name, None)
-            if retriever is not None:
-                try:
-                    if hasattr(retriever, 'vectorstore'):
-                        vs = retriever.vectorstore
-                        if hasattr(vs, 'client'):
-                            vs.client.close()
-                            self.logger.info(f"Closed client for {retriever_name}")
-                        elif hasattr(vs, 'connection'):
-                            vs.connection.close()
-                            self.logger.info(f"Closed connection for {retriever_name}")
-                        elif hasattr(vs, 'pool'):
-                            vs.pool.close()
-                            self.logger.info(f"Closed pool for {retriever_name}")
-                        else:
-                            self.logger.warning(f"No known cleanup method for {retriever_name}")
-                    else:
-                        self.logger.warning(f"{retriever_name} has no vectorstore attribute")
-                except Exception as e:
-                    self.logger.error(f"Error during cleanup of {retriever_name}: {str(e)}")
-
+        self._article_retriever = None
+        self._player_retriever = None
+        self.clients.close()
         self.logger.info("Cleanup completed")
 
 # Usage example (commented out)
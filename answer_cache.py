@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Ingestion scripts touch this file; caches holding answers built from the old tables drop them
+INGEST_MARKER_PATH = os.path.join('data', '.cache', 'ingest_generation.json')
+
+
+def mark_ingested(table_name, marker_path=INGEST_MARKER_PATH):
+    generations = {}
+    if os.path.exists(marker_path):
+        try:
+            with open(marker_path) as f:
+                generations = json.load(f)
+        except (OSError, ValueError):
+            generations = {}
+    generations[table_name] = time.time()
+    os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+    with atomic_write(marker_path, 'w') as f:
+        json.dump(generations, f)
+
+
+def ingest_generation(marker_path=INGEST_MARKER_PATH):
+    try:
+        return os.stat(marker_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def answer_scope(intent):
+    # What a question is about. Questions that differ only in the player or position ("best late-round QB"
+    # vs "best late-round RB") embed almost identically, so a hit also needs the same scope.
+    return (tuple(sorted(intent["player_ids"])), tuple(sorted(intent["teams"])),
+            tuple(sorted(intent["positions"])), tuple(sorted(intent["unresolved_names"])))
+
+
+class SemanticAnswerCache:
+    def __init__(self, similarity_threshold=0.95, ttl_seconds=3600, max_entries=512, marker_path=INGEST_MARKER_PATH):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.marker_path = marker_path
+        self._lock = threading.Lock()
+        self._generation = ingest_generation(marker_path)
+        self._vectors = None  # (n, dim) unit vectors, row i belongs to self._entries[i]
+        self._entries = []
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_generation(self):
+        generation = ingest_generation(self.marker_path)
+        if generation != self._generation:
+            self._generation = generation
+            if self._entries:
+                logger.info("Vector tables were re-ingested; clearing answer cache")
+                self.invalidations += 1
+            self._vectors = None
+            self._entries = []
+
+    def _drop(self, keep):
+        self._entries = [entry for entry, k in zip(self._entries, keep) if k]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    def _expire(self, now):
+        if self._entries:
+            keep = np.array([now - entry['created'] < self.ttl_seconds for entry in self._entries])
+            if not keep.all():
+                self._drop(keep)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, scope=()):
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            self._expire(now)
+            in_scope = np.array([entry['scope'] == scope for entry in self._entries], dtype=bool)
+            if not in_scope.any():
+                self.misses += 1
+                return None
+            similarities = np.where(in_scope, self._vectors @ self._unit(vector), -np.inf)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            entry = self._entries[best]
+            entry['last_hit'] = now
+            entry['hits'] += 1
+            self.hits += 1
+            logger.info(f"Answer cache hit ({similarities[best]:.3f}) for: {entry['question']}")
+            return entry['answer']
+
+    def store(self, vector, question, answer, scope=()):
+        now = time.time()
+        with self._lock:
+            self._check_generation()
+            self._expire(now)
+            if len(self._entries) >= self.max_entries:
+                # Full of live entries: evict the one idle the longest
+                idle = [entry['last_hit'] for entry in self._entries]
+                keep = np.ones(len(self._entries), dtype=bool)
+                keep[int(np.argmin(idle))] = False
+                self._drop(keep)
+            unit = self._unit(vector)[None, :]
+            self._vectors = unit if self._vectors is None else np.vstack([self._vectors, unit])
+            self._entries.append({'question': question, 'answer': answer, 'scope': scope, 'created': now,
+                                  'last_hit': now, 'hits': 0})
+
+    def invalidate(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+            self.invalidations += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'invalidations': self.invalidations,
+        }
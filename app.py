@@ -1,17 +1,20 @@
-from flask import Flask, render_template, request, jsonify, Response
-from models.draft_recommendation import FantasyFootballDraftAssistant
+from startup_profile import phase, report
 import logging
 import os
-import numpy as np
-from dotenv import load_dotenv
-from langchain_community.vectorstores import TiDBVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
+import math
 import json
-import yaml
-from NFLFantasyQA import NFLFantasyQA
-from utils import create_retriever, create_chatbot, create_youtube_retriever, split_response,create_nfl_fantasy_chatbot
+import threading
+
+with phase('flask + config'):
+    import yaml
+    from dotenv import load_dotenv
+    from flask import Flask, render_template, request, jsonify, Response
+    from utils import create_chatbot, create_youtube_retriever, stream_sse_events
+    from clients import get_clients
+    from player_names import get_player_index
+    from player_similarity import get_similarity_index
+    from request_coalescer import StreamCoalescer, normalize_question
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +26,7 @@ YOUTUBE_TABLE_NAME = config['vectordb']['youtube']
 ARTICLE_TABLE_NAME = config['vectordb']['article']
 PLAYER_REPORT_TABLE_NAME=config['vectordb']['playerreport']
 EMBEDDING_MODEL = config['EMBEDDING_MODEL']
+FAST_STARTUP = os.getenv('FAST_STARTUP', str(config['startup']['fast_mode'])).lower() in ('1', 'true', 'yes')
 
 
 # Load environment variables
@@ -30,9 +34,28 @@ load_dotenv()
 tidb_connection_string = os.getenv('TIDB_CONNECTION_URL')
 google_api_key = os.getenv('GOOGLE_API_KEY')
 
-# Initialize the NFLFantasyQA instance
-nfl_fantasy_qa = NFLFantasyQA()
-embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
+
+# RAG and LLM clients are created on first use; importing langchain alone costs seconds
+_chat_lock = threading.Lock()
+_nfl_fantasy_qa = None
+_embeddings = None
+
+def get_nfl_fantasy_qa():
+    global _nfl_fantasy_qa
+    if _nfl_fantasy_qa is None:
+        with _chat_lock:
+            if _nfl_fantasy_qa is None:
+                from NFLFantasyQA import NFLFantasyQA
+                _nfl_fantasy_qa = NFLFantasyQA()
+    return _nfl_fantasy_qa
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _chat_lock:
+            if _embeddings is None:
+                _embeddings = get_clients().embeddings
+    return _embeddings
 
 
 # Configure logging
@@ -43,19 +66,35 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
 # Initialize and load the draft assistant
-draft_assistant = FantasyFootballDraftAssistant()
-draft_assistant.load_data('data/cbs_fantasy_projection_master.csv')
-
-model_file = 'models/fantasy_football_model.pkl'
-if os.path.exists(model_file):
-    draft_assistant.load_model(model_file)
-    logging.info("Loaded existing model.")
-else:
-    logging.error("Pre-trained model not found. Please ensure the model file exists.")
-
-# Constants for chatbot
-
-
+with phase('draft assistant'):
+    from models.draft_reloader import DraftAssistantReloader
+    draft_reloader = DraftAssistantReloader(
+        'data/cbs_fantasy_projection_master.csv',
+        'models/fantasy_football_model.pkl',
+        snapshot_path=config['startup']['draft_snapshot'] if FAST_STARTUP else None,
+        poll_interval=config['draft_reload']['poll_interval']
+    )
+    if config['draft_reload']['enabled']:
+        draft_reloader.start()
+
+if not FAST_STARTUP:
+    with phase('chat clients'):
+        get_nfl_fantasy_qa()
+        get_embeddings()
+
+logger.info(report())
+
+# Keep proxies from buffering streamed tokens
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+coalescing_config = dict(config['coalescing'])
+coalescer = StreamCoalescer(**coalescing_config) if coalescing_config.pop('enabled') else None
+
+def coalesced(key, producer):
+    # Identical questions asked while one is being answered share its token stream
+    if coalescer is None:
+        return producer()
+    return coalescer.stream(key, producer)
 
 # Routes
 @app.route('/')
@@ -70,16 +109,45 @@ def draft():
 def research():
     return render_template('research.html')
 
+@app.after_request
+def add_draft_version(response):
+    # Lets clients and caches notice when projections or the Q-table were hot-reloaded
+    response.headers['X-Draft-Version'] = draft_reloader.version
+    return response
+
+@app.route('/api/draft_version', methods=['GET'])
+def get_draft_version():
+    return jsonify({"version": draft_reloader.version})
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    stats = {}
+    if _embeddings is not None:
+        from embedding_cache import embedding_stats
+        stats['embeddings'] = embedding_stats()
+    if _nfl_fantasy_qa is not None and _nfl_fantasy_qa.answer_cache is not None:
+        stats['answers'] = _nfl_fantasy_qa.answer_cache.stats()
+    if _nfl_fantasy_qa is not None:
+        stats['stages'] = _nfl_fantasy_qa.stage_stats()
+        if _nfl_fantasy_qa._search_tool is not None:
+            stats['web_search'] = _nfl_fantasy_qa._search_tool.stats()
+    if coalescer is not None:
+        stats['coalescing'] = coalescer.stats()
+    return jsonify(stats)
+
 @app.route('/api/available_players', methods=['GET'])
 def get_available_players():
     logging.debug("Received request for available players")
-    players = draft_assistant.df.replace({np.nan: None}).to_dict('records')
+    draft_assistant = draft_reloader.current()
+    players = [dict(player) for player in draft_assistant.players]
     
-    # Convert any remaining non-JSON-serializable values to strings
+    # Convert NaN and any remaining non-JSON-serializable values
     for player in players:
         for key, value in player.items():
-            if isinstance(value, (np.integer, np.floating)):
-                player[key] = float(value)
+            if isinstance(value, float) and math.isnan(value):
+                player[key] = None
+            elif hasattr(value, 'item'):
+                player[key] = value.item()
             elif not isinstance(value, (str, int, float, bool, type(None))):
                 player[key] = str(value)
     
@@ -101,9 +169,10 @@ def get_recommendations():
         return jsonify({"error": "No available players", "details": data}), 400
     
     try:
+        draft_assistant = draft_reloader.current()
         # Convert team and available_players from list of names to list of player dictionaries
-        team_dicts = [next(p for p in draft_assistant.players if p['player'] == player) for player in team]
-        available_player_dicts = [next(p for p in draft_assistant.players if p['player'] == player) for player in available_players]
+        team_dicts = [draft_assistant.find_player(player) for player in team]
+        available_player_dicts = [draft_assistant.find_player(player) for player in available_players]
         
         recommendations = draft_assistant.recommend_players(team_dicts, available_player_dicts, round_num, pick_number)
         
@@ -125,22 +194,17 @@ def chatbot():
 
     def generate():
         try:
-            response = nfl_fantasy_qa.get_answer(question)
-            
-            content, references = split_response(response)
-            
-            for chunk in content.split('\n'):
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            
-            if references:
-                yield f"data: {json.dumps({'references': references})}\n\n"
+            nfl_fantasy_qa = get_nfl_fantasy_qa()
+            tokens = coalesced(('chatbot', normalize_question(question)),
+                               lambda: nfl_fantasy_qa.stream_answer(question))
+            yield from stream_sse_events(tokens, finalize=nfl_fantasy_qa.finalize_answer)
             
             yield "data: [DONE]\n\n"
         except Exception as e:
             logging.exception("Error in chatbot response generation")
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
-    return Response(generate(), content_type='text/event-stream')
+    return Response(generate(), content_type='text/event-stream', headers=SSE_HEADERS)
 
 # Helper function to split the response into content and references
 # def split_response(response):
@@ -159,20 +223,16 @@ def youtube_chat():
 
     def generate():
         try:
-            retriever = create_youtube_retriever(channels=channels,
-                                                embeddings=embeddings,
-                                                tidb_connection_string=tidb_connection_string,
-                                                YOUTUBE_TABLE_NAME=YOUTUBE_TABLE_NAME)
-            chatbot_chain = create_chatbot(retriever=retriever,google_api_key=google_api_key)
-            response = chatbot_chain.invoke(question)
-            
-            content, references = split_response(response.content)
-            
-            for chunk in content.split('\n'):
-                yield f"data: {json.dumps({'chunk': chunk})}\n\n"
-            
-            if references:
-                yield f"data: {json.dumps({'references': references})}\n\n"
+            def answer_tokens():
+                retriever = create_youtube_retriever(channels=channels,
+                                                    embeddings=get_embeddings(),
+                                                    tidb_connection_string=tidb_connection_string,
+                                                    YOUTUBE_TABLE_NAME=YOUTUBE_TABLE_NAME)
+                chatbot_chain = create_chatbot(retriever=retriever,google_api_key=google_api_key)
+                return (chunk.content for chunk in chatbot_chain.stream(question))
+
+            tokens = coalesced(('youtube', normalize_question(question), tuple(sorted(channels))), answer_tokens)
+            yield from stream_sse_events(tokens)
             
         except Exception as e:
             logging.exception("Error in YouTube chatbot response generation")
@@ -180,11 +240,12 @@ def youtube_chat():
         
         yield "data: [DONE]\n\n"
 
-    return Response(generate(), content_type='text/event-stream')
+    return Response(generate(), content_type='text/event-stream', headers=SSE_HEADERS)
 
 
 @app.route('/api/player_list', methods=['GET'])
 def get_player_list():
+    draft_assistant = draft_reloader.current()
     player_list = [player['player'] for player in draft_assistant.players]
     return jsonify(player_list)
 
@@ -196,12 +257,14 @@ def similar_players():
         return jsonify({"error": "No player name provided"}), 400
 
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
-        vector_store = TiDBVectorStore.from_existing_vector_table(
-            embedding=embeddings,
-            connection_string=tidb_connection_string,
-            table_name=PLAYER_REPORT_TABLE_NAME
-        )
+        name_index = get_player_index()
+        player_id = name_index.resolve(player_name)
+        # Precomputed at ingestion time; the vector searches below only run for players missing from it
+        precomputed = get_similarity_index().similar(player_id) if player_id else None
+        if precomputed is not None:
+            return jsonify(precomputed)
+
+        vector_store = get_clients().vector_store(PLAYER_REPORT_TABLE_NAME, embedding=get_embeddings())
 
         # First, find the exact player
         player_docs = vector_store.similarity_search_with_score(player_name, k=1)
@@ -215,7 +278,10 @@ def similar_players():
         
         results = []
         for doc, score in similar_docs:
-            if doc.metadata['player'] != player_name:  # Exclude the queried player
+            # Exclude the queried player, however it was spelled
+            same_player = doc.metadata['player'] == player_name or (
+                player_id is not None and name_index.resolve(doc.metadata['player']) == player_id)
+            if not same_player:
                 results.append({
                     "player": doc.metadata['player'],
                     "position": doc.metadata['pos'],
@@ -0,0 +1,107 @@
+import asyncio
+import contextlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import (app as flask_app, config, get_embeddings, get_nfl_fantasy_qa, google_api_key,
+                 tidb_connection_string, SSE_HEADERS, YOUTUBE_TABLE_NAME)
+from request_coalescer import AsyncStreamCoalescer, normalize_question
+from utils import astream_sse_events, create_chatbot, create_youtube_retriever
+
+# Serve with: uvicorn asgi:app --host 0.0.0.0 --port $PORT
+# Chat streams are coroutines, so an open stream costs a socket rather than a worker thread. Blocking
+# library calls they make (TiDB, DuckDuckGo, embedding lookups) share one bounded executor, and every
+# other route is the unchanged Flask app running in its own thread pool, so draft requests never queue
+# behind chats.
+logger = logging.getLogger(__name__)
+
+asgi_config = config['asgi']
+coalescing_config = dict(config['coalescing'])
+coalescer = AsyncStreamCoalescer(**coalescing_config) if coalescing_config.pop('enabled') else None
+
+
+def coalesced(key, producer):
+    if coalescer is None:
+        return producer()
+    return coalescer.stream(key, producer)
+
+
+async def chatbot(request):
+    question = (await request.json()).get('question')
+    if not question:
+        return JSONResponse({"error": "No question provided"}, status_code=400)
+
+    async def generate():
+        try:
+            nfl_fantasy_qa = await asyncio.get_running_loop().run_in_executor(None, get_nfl_fantasy_qa)
+            tokens = coalesced(('chatbot', normalize_question(question)),
+                               lambda: nfl_fantasy_qa.astream_answer(question))
+            async for event in astream_sse_events(tokens, finalize=nfl_fantasy_qa.finalize_answer):
+                yield event
+
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            logger.exception("Error in chatbot response generation")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def youtube_chat(request):
+    body = await request.json()
+    question = body.get('question')
+    channels = body.get('channels', [])
+    if not question:
+        return JSONResponse({"error": "No question provided"}, status_code=400)
+
+    async def generate():
+        try:
+            def build_chain():
+                # Connects to TiDB (and syncs the local index when enabled), so it stays off the event loop
+                retriever = create_youtube_retriever(channels=channels,
+                                                     embeddings=get_embeddings(),
+                                                     tidb_connection_string=tidb_connection_string,
+                                                     YOUTUBE_TABLE_NAME=YOUTUBE_TABLE_NAME)
+                return create_chatbot(retriever=retriever, google_api_key=google_api_key)
+
+            async def answer_tokens():
+                chatbot_chain = await asyncio.get_running_loop().run_in_executor(None, build_chain)
+                async for chunk in chatbot_chain.astream(question):
+                    yield chunk.content
+
+            tokens = coalesced(('youtube', normalize_question(question), tuple(sorted(channels))), answer_tokens)
+            async for event in astream_sse_events(tokens):
+                yield event
+
+        except Exception as e:
+            logger.exception("Error in YouTube chatbot response generation")
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # langchain runs sync retrievers, tools and graph nodes through the loop's default executor
+    executor = ThreadPoolExecutor(max_workers=asgi_config['executor_workers'], thread_name_prefix='chat')
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/chatbot', chatbot, methods=['POST']),
+        Route('/api/youtube_chat', youtube_chat, methods=['POST']),
+        Mount('/', WSGIMiddleware(flask_app, workers=asgi_config['wsgi_workers'])),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,98 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from rate_limit import TokenBucket, call_with_retry
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BatchIngester:
+    # Embeds rows in API-sized batches on a bounded pool under one shared rate limit, and writes them with
+    # multi-row INSERTs as batches complete. Row ids are deterministic (see ingest_manifest), so the table
+    # is its own checkpoint: a rerun skips ids that are already stored, and embeddings that finished
+    # before a crash come back from the embedding cache.
+    def __init__(self, embeddings, engine, table_name, batch_size=100, max_concurrency=4, requests_per_minute=150,
+                 max_retries=5, insert_batch_size=200):
+        self.embeddings = embeddings
+        self.engine = engine
+        self.table_name = table_name
+        # batchEmbedContents accepts at most 100 texts per request
+        self.batch_size = min(batch_size, 100)
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(requests_per_minute, burst=max_concurrency)
+        self.max_retries = max_retries
+        self.insert_batch_size = insert_batch_size
+
+    def existing_ids(self, ids):
+        from sqlalchemy import bindparam, text
+        query = text(f"SELECT id FROM {self.table_name} WHERE id IN :ids").bindparams(bindparam('ids', expanding=True))
+        found = set()
+        with self.engine.connect() as connection:
+            for batch in _batches(list(ids), 500):
+                found.update(row[0] for row in connection.execute(query, {'ids': batch}))
+        return found
+
+    def _embed(self, texts):
+        return call_with_retry(self.embeddings.embed_documents, texts, max_retries=self.max_retries, bucket=self.bucket)
+
+    def _insert(self, rows):
+        from sqlalchemy import text
+        # One transaction per flush; the driver sends the parameter list as a single multi-row INSERT
+        statement = text(f"INSERT INTO {self.table_name} (id, embedding, document, meta) "
+                         f"VALUES (:id, :embedding, :document, :meta)")
+        with self.engine.begin() as connection:
+            connection.execute(statement, [
+                {'id': row_id, 'embedding': json.dumps(vector), 'document': document,
+                 'meta': json.dumps(metadata, default=str)}
+                for row_id, vector, document, metadata in rows
+            ])
+
+    def ingest(self, ids, texts, metadatas):
+        # Returns the ids now stored (including ones a previous run already wrote) and the ids that failed
+        start = time.perf_counter()
+        done = self.existing_ids(ids)
+        pending = [(row_id, text, metadata) for row_id, text, metadata in zip(ids, texts, metadatas)
+                   if row_id not in done]
+        if done:
+            logger.info(f"{self.table_name}: {len(done)} of {len(ids)} rows already stored, resuming")
+        failed = []
+        buffer = []
+        embedded = 0
+
+        def flush():
+            if buffer:
+                self._insert(buffer)
+                done.update(row[0] for row in buffer)
+                buffer.clear()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='embed') as executor:
+            futures = {executor.submit(self._embed, [text for _, text, _ in batch]): batch
+                       for batch in _batches(pending, self.batch_size)}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                except Exception as e:
+                    logger.error(f"{self.table_name}: embedding batch of {len(batch)} failed: {str(e)}")
+                    failed.extend(row_id for row_id, _, _ in batch)
+                    continue
+                buffer.extend((row_id, vector, text, metadata)
+                              for (row_id, text, metadata), vector in zip(batch, vectors))
+                embedded += len(batch)
+                if len(buffer) >= self.insert_batch_size:
+                    flush()
+                elapsed = time.perf_counter() - start
+                logger.info(f"{self.table_name}: embedded {embedded}/{len(pending)} "
+                            f"({embedded / elapsed:.1f} rows/s, {self.bucket.waited:.1f}s rate-limited)")
+            flush()
+
+        logger.info(f"{self.table_name}: stored {len(pending) - len(failed)} rows in "
+                    f"{time.perf_counter() - start:.1f}s, {len(failed)} failed")
+        return done, failed
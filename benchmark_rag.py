@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+import yaml
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import clients
+from clients import ClientRegistry
+from data_cache import load_table
+
+logger = logging.getLogger(__name__)
+
+# Replays a fixed question set through NFLFantasyQA, the YouTube chain and similar players with local
+# stand-ins for Gemini, Google embeddings, TiDB and DuckDuckGo, so pipeline changes can be compared
+# without network access or API quota:
+#   python benchmark_rag.py --llm-latency 0.4 --search-latency 0.8
+
+OUTLOOK_FILE = 'results/player_outlook.csv'
+with open(clients.CONFIG_PATH, 'r') as file:
+    VECTORDB = yaml.safe_load(file)['vectordb']
+TABLES = {'article': VECTORDB['article'], 'player': VECTORDB['playerreport'], 'youtube': VECTORDB['youtube']}
+CHANNELS = ['CBSFantasyFootball', 'FlockFantasy', 'UnderdogFantasy', 'FantasyPros']
+# Retrieval recall counts a hit only within the first k contexts of a source
+RECALL_K = {'player': 2, 'article': 5}
+STRATEGY_QUESTIONS = [
+    "What is the best draft strategy for a 12 team PPR league?",
+    "Should I use a zero RB approach this year?",
+    "Which late round quarterbacks are worth a pick?",
+    "Who are the top rookie wide receivers to target?",
+    "How should I handle bye weeks when drafting?",
+]
+
+
+class HashingEmbeddings(Embeddings):
+    # Deterministic bag-of-words vectors: lexical overlap stands in for semantic similarity
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r'[a-z0-9]+', text.lower()):
+            digest = int(hashlib.md5(token.encode()).hexdigest(), 16)
+            vector[digest % self.dim] += 1.0 if (digest >> 64) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+def echo_llm(latency, reply=None):
+    # Waits like a model would, then echoes the start of the prompt with a references section
+    def respond(prompt):
+        time.sleep(latency)
+        text = prompt.to_string() if hasattr(prompt, 'to_string') else str(prompt)
+        return AIMessage(content=reply or f"{text[:200]}\n\n## References\n1. [Fixture](local)")
+    return RunnableLambda(respond)
+
+
+class FakeSearch:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run(self, query, *args, **kwargs):
+        time.sleep(self.latency)
+        return f"Search results for {query}: no live data in benchmark mode."
+
+
+def chunk(text, size=1000, overlap=200):
+    return [text[start:start + size] for start in range(0, max(len(text) - overlap, 1), size - overlap)]
+
+
+def build_fixtures(path, embeddings):
+    # A sqlite stand-in for the TiDB tables, in the same layout, so LocalVectorIndex.sync() loads it
+    # exactly as it would mirror TiDB
+    from sqlalchemy import create_engine
+
+    df = load_table(OUTLOOK_FILE)
+    rows = defaultdict(list)
+    for i, player in enumerate(df.itertuples(index=False)):
+        meta = {'player': player.player, 'pos': player.pos, 'team': player.team,
+                'ppr_projection': float(player.ppr_projection)}
+        rows['player'].append((f"p{i}", player.Outlook, meta))
+        for j, text in enumerate(chunk(player.Outlook)):
+            rows['article'].append((f"a{i}-{j}", text, {'player': player.player}))
+            rows['youtube'].append((f"y{i}-{j}", text, {'player': player.player,
+                                                        'channel_name': CHANNELS[i % len(CHANNELS)]}))
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for source, table_rows in rows.items():
+            table = TABLES[source]
+            conn.exec_driver_sql(f"CREATE TABLE {table} (id TEXT PRIMARY KEY, update_time TEXT, "
+                                 f"document TEXT, meta TEXT, embedding TEXT)")
+            vectors = embeddings.embed_documents([text for _, text, _ in table_rows])
+            conn.exec_driver_sql(
+                f"INSERT INTO {table} VALUES (?, 'fixture', ?, ?, ?)",
+                [(row_id, text, json.dumps(meta), json.dumps(vector))
+                 for (row_id, text, meta), vector in zip(table_rows, vectors)]
+            )
+    return engine, df
+
+
+class OfflineClients(ClientRegistry):
+    def __init__(self, engine, index_dir, llm_latency):
+        super().__init__(None, None, 'hashing', local_index={'enabled': True})
+        self.engine = engine
+        self.index_dir = index_dir
+        self.llm_latency = llm_latency
+        self._embeddings = HashingEmbeddings()
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def vector_store(self, table_name, embedding=None, connection_string=None):
+        from vector_index import LocalVectorIndex
+        with self._lock:
+            if table_name not in self._local_indexes:
+                self._local_indexes[table_name] = LocalVectorIndex(
+                    table_name, self._embeddings, engine_factory=lambda: self.engine,
+                    index_dir=self.index_dir, sync_interval=float('inf'))
+                self._local_indexes[table_name].sync()
+            return self._local_indexes[table_name]
+
+    def chat_model(self, model=clients.DEFAULT_CHAT_MODEL, **params):
+        if 'generation_config' in params:
+            # The player classifier asks for JSON
+            return echo_llm(self.llm_latency / 2, reply='```json\n{"needs_player_info": true}\n```')
+        return echo_llm(self.llm_latency)
+
+
+def percentiles(samples, scale=1000):
+    values = np.asarray(samples, dtype=float) * scale
+    return {'n': len(values), 'p50': np.percentile(values, 50), 'p95': np.percentile(values, 95),
+            'p99': np.percentile(values, 99)}
+
+
+def timed(name, func, timings):
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name].append(time.perf_counter() - start)
+    return run
+
+
+def name_variant(name, i):
+    # How people actually type names: lower case without punctuation, surname only, or a transposed letter
+    tokens = re.sub(r"[.'`]", '', name).split()
+    if i % 3 == 0:
+        return ' '.join(tokens).lower()
+    if i % 3 == 1:
+        return tokens[-1]
+    surname = tokens[-1]
+    if len(surname) > 4:
+        surname = surname[:2] + surname[3] + surname[2] + surname[4:]
+    return ' '.join(tokens[:-1] + [surname])
+
+
+def description_query(player, outlook):
+    # A paraphrase-like query that never names the player: half the words of one outlook sentence
+    pattern = '|'.join(re.escape(part) for part in player.split())
+    sentences = [s for s in re.split(r'(?<=[.!?])\s+', re.sub(pattern, '', outlook, flags=re.IGNORECASE))
+                 if len(s.split()) >= 12]
+    if not sentences:
+        return None
+    words = sentences[len(sentences) // 2].split()
+    return f"Which player is this: {' '.join(words[::2])}"
+
+
+def held_out_questions(sample):
+    # Recall is measured on queries that are not verbatim fixture text: misspelled or partial names, and
+    # descriptions with the name removed. A fixture-derived question would always find its own outlook.
+    questions = []
+    for i, row in enumerate(sample.itertuples(index=False)):
+        questions.append(('name', f"What about {name_variant(row.player, i)} this season?", row.player, row.Outlook))
+        description = description_query(row.player, row.Outlook)
+        if description:
+            questions.append(('description', description, row.player, row.Outlook))
+    return questions
+
+
+def run_benchmark(*args, **kwargs):
+    # Fixtures, mirrors and indexes live in a scratch directory that is removed afterwards
+    with tempfile.TemporaryDirectory(prefix='rag-bench-') as workdir:
+        return _run_benchmark(workdir, *args, **kwargs)
+
+
+def _run_benchmark(workdir, llm_latency=0.2, search_latency=0.3, repeat=3, player_questions=40,
+                   measure_allocations=True, keyword_index=True):
+    from keyword_index import rebuild_keyword_index
+    from NFLFantasyQA import NFLFantasyQA, AgentState
+    from player_names import get_player_index
+    from player_similarity import PlayerSimilarityIndex, rebuild_similarity_table
+    from utils import create_chatbot, create_youtube_retriever
+
+    embeddings = HashingEmbeddings()
+    engine, df = build_fixtures(os.path.join(workdir, 'fixtures.sqlite'), embeddings)
+    registry = OfflineClients(engine, os.path.join(workdir, 'vectors'), llm_latency)
+    clients._registry = registry
+
+    qa = NFLFantasyQA()
+    qa.answer_cache = None
+    qa._search_tool = FakeSearch(search_latency)
+    qa.keyword_config = dict(qa.keyword_config, enabled=keyword_index, index_dir=os.path.join(workdir, 'keywords'))
+    if keyword_index:
+        for table in TABLES.values():
+            rebuild_keyword_index(engine, table, qa.keyword_config['index_dir'])
+    timings = defaultdict(list)
+    for stage, node in [('article', 'get_article_context'), ('player', 'get_player_context'),
+                        ('web', 'search_web'), ('answer', 'generate_answer')]:
+        setattr(qa, node, timed(stage, getattr(qa, node), timings))
+
+    sample = df.sample(n=min(player_questions, len(df)), random_state=7)
+    questions = held_out_questions(sample)
+    questions += [('strategy', question, None, None) for question in STRATEGY_QUESTIONS]
+
+    # Warm-up: loads the local indexes and builds the graph outside the measurements
+    qa.agent.invoke(AgentState(question=questions[0][1], contexts=[], final_answer=""))
+    timings.clear()
+
+    def top(state, source, k):
+        return [ctx['content'] for ctx in state['contexts']
+                if ctx['source'] == source and not ctx.get('failed') and ctx.get('rank', k) < k]
+
+    hits, asked = defaultdict(int), defaultdict(int)
+    for attempt in range(repeat):
+        for kind, question, player, outlook in questions:
+            start = time.perf_counter()
+            state = qa.agent.invoke(AgentState(question=question, contexts=[], final_answer=""))
+            timings['qa total'].append(time.perf_counter() - start)
+            # Retrieval is deterministic, so recall only needs the first pass
+            if player is None or attempt:
+                continue
+            asked[kind] += 1
+            hits[f"{kind} player@{RECALL_K['player']}"] += outlook in top(state, 'player', RECALL_K['player'])
+            hits[f"{kind} article@{RECALL_K['article']}"] += any(
+                doc in outlook for doc in top(state, 'article', RECALL_K['article']))
+
+    retriever = create_youtube_retriever(embeddings, None, TABLES['youtube'], channels=CHANNELS[:2])
+    youtube_chain = create_chatbot(retriever, None)
+    for _ in range(repeat):
+        for _, question, *_ in questions:
+            start = time.perf_counter()
+            youtube_chain.invoke(question)
+            timings['youtube chain'].append(time.perf_counter() - start)
+
+    similarity_path = os.path.join(workdir, 'player_similarity.json')
+    player_store = registry.vector_store(TABLES['player'])
+    rebuild_similarity_table(engine, TABLES['player'], similarity_path)
+    similarity_index = PlayerSimilarityIndex(similarity_path)
+    name_index = get_player_index()
+    for _ in range(repeat):
+        for row in sample.itertuples(index=False):
+            start = time.perf_counter()
+            similarity_index.similar(name_index.resolve(row.player))
+            timings['similar (table)'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            doc, _ = player_store.similarity_search_with_score(row.player, k=1)[0]
+            player_store.similarity_search_with_score(doc.page_content, k=7)
+            timings['similar (search)'].append(time.perf_counter() - start)
+
+    latency = {stage: percentiles(samples) for stage, samples in timings.items()}
+    allocations = []
+    if measure_allocations:
+        tracemalloc.start()
+        for _, question, *_ in questions:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            qa.agent.invoke(AgentState(question=question, contexts=[], final_answer=""))
+            allocations.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        'latency_ms': latency,
+        'recall': {name: count / asked[name.split()[0]] for name, count in sorted(hits.items())},
+        'peak_alloc_kib': percentiles(allocations, scale=1 / 1024) if allocations else None,
+    }
+
+
+def report(results):
+    lines = [f"{'stage':<20} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for stage, stats in results['latency_ms'].items():
+        lines.append(f"{stage:<20} {stats['n']:>5} {stats['p50']:9.2f} {stats['p95']:9.2f} {stats['p99']:9.2f}")
+    if results['peak_alloc_kib']:
+        stats = results['peak_alloc_kib']
+        lines.append(f"{'peak alloc (KiB)':<20} {stats['n']:>5} {stats['p50']:9.1f} {stats['p95']:9.1f} {stats['p99']:9.1f}")
+    for name, value in results['recall'].items():
+        lines.append(f"recall {name:<25} {value:.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline RAG latency and retrieval quality benchmark")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="seconds per stand-in LLM call")
+    parser.add_argument('--search-latency', type=float, default=0.3, help="seconds per stand-in web search")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--questions', type=int, default=40, help="player questions sampled from the fixtures")
+    parser.add_argument('--no-allocations', action='store_true')
+    parser.add_argument('--no-keyword-index', action='store_true', help="vector retrieval only")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    print(report(run_benchmark(args.llm_latency, args.search_latency, args.repeat, args.questions,
+                               measure_allocations=not args.no_allocations,
+                               keyword_index=not args.no_keyword_index)))
@@ -1,3 +1,4 @@
+import argparse
 import csv
 import os
 from typing import TypedDict, List, Dict
@@ -13,6 +14,14 @@ import logging
 import sys
 import re
 import time
+import yaml
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Shared modules (search_cache, ...) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search_cache import CachedSearch
+from rate_limit import TokenBucket, call_with_retry
+from job_queue import JobQueue
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,8 +33,26 @@ class AgentState(TypedDict):
     player_info: Dict[str, str]
     status: str
 
-# Initialize tools
-search = DuckDuckGoSearchRun()
+with open('static/config.yml', 'r') as file:
+    config = yaml.safe_load(file)
+
+report_config = config['player_reports']
+
+class RateLimitedSearch:
+    # Every real DuckDuckGo request waits for a token, and rate-limit errors back off and retry.
+    # CachedSearch sits in front, so cache hits never spend a token
+    def __init__(self, search, bucket, max_retries):
+        self.search = search
+        self.bucket = bucket
+        self.max_retries = max_retries
+
+    def run(self, query, *args, **kwargs):
+        return call_with_retry(self.search.run, query, max_retries=self.max_retries, bucket=self.bucket)
+
+# Initialize tools; searches are cached on disk and shared with the web app
+search_bucket = TokenBucket(report_config['search_requests_per_minute'], burst=report_config['search_burst'])
+search = CachedSearch(RateLimitedSearch(DuckDuckGoSearchRun(), search_bucket, report_config['search_max_retries']),
+                      **config['search_cache'])
 tools = [
     Tool(
         name="Search",
@@ -110,59 +137,92 @@ player_info_executor = AgentExecutor(
 )
 
 def get_player_report(player_name: str) -> str:
+    # Errors propagate so the job is retried instead of an error message being saved as the outlook
     logging.info(f"{player_name}: Gathering information...")
-    try:
-        result = player_info_executor.invoke({
-            "input": player_name,
-            "tools": "\n".join([f"{tool.name}: {tool.description}" for tool in tools]),
-            "tool_names": ", ".join([tool.name for tool in tools]),
-            "agent_scratchpad": ""
-        })
-        
-        logging.info(f"{player_name}: Generating report...")
-        report_chain = REPORT_GENERATION_PROMPT | llm
-        report = report_chain.invoke({"player_name": player_name, "player_info": result['output']})
-        
-        logging.info(f"{player_name}: Completed")
-        return report
-    except Exception as e:
-        logging.error(f"Error processing {player_name}: {str(e)}")
-        return f"Error processing player: {str(e)}"
+    result = player_info_executor.invoke({
+        "input": player_name,
+        "tools": "\n".join([f"{tool.name}: {tool.description}" for tool in tools]),
+        "tool_names": ", ".join([tool.name for tool in tools]),
+        "agent_scratchpad": ""
+    })
+
+    logging.info(f"{player_name}: Generating report...")
+    report_chain = REPORT_GENERATION_PROMPT | llm
+    report = report_chain.invoke({"player_name": player_name, "player_info": result['output']})
+
+    logging.info(f"{player_name}: Completed")
+    return report
 
 def clean_player_name(name: str) -> str:
     return re.sub(r'[^a-zA-Z0-9]', '', name)
 
 def process_player(row: Dict[str, str], output_folder: str) -> None:
     player_name = row['player']
-    try:
-        outlook = get_player_report(player_name)
-        
-        clean_name = clean_player_name(player_name)
-        output_file = os.path.join(output_folder, f"{clean_name}.csv")
-        
-        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-            fieldnames = list(row.keys()) + ['Outlook']
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-            row['Outlook'] = outlook
-            writer.writerow(row)
-        
-        logging.info(f"Report saved for {player_name}")
-    except Exception as e:
-        logging.error(f"Error saving report for {player_name}: {str(e)}")
-
-def process_players(input_file: str, output_folder: str):
+    outlook = get_player_report(player_name)
+
+    clean_name = clean_player_name(player_name)
+    output_file = os.path.join(output_folder, f"{clean_name}.csv")
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+        fieldnames = list(row.keys()) + ['Outlook']
+        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
+        writer.writeheader()
+        row['Outlook'] = outlook
+        writer.writerow(row)
+
+    logging.info(f"Report saved for {player_name}")
+
+def process_players(input_file: str, output_folder: str, refresh: bool = False):
+    # Players are jobs in a persistent queue: finished ones are skipped on the next run unless their row in
+    # the input changed or refresh is set, interrupted ones resume, and failures retry with backoff.
+    # Pacing comes from the search token bucket, not sleeps
     os.makedirs(output_folder, exist_ok=True)
-    
+    queue = JobQueue('player_reports', report_config['queue_path'], max_attempts=report_config['max_attempts'],
+                     retry_base_delay=report_config['retry_base_delay'], max_revivals=report_config['max_revivals'])
+
+    if refresh:
+        logging.info(f"Refreshing {queue.refresh()} previously processed players")
     with open(input_file, 'r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            process_player(row, output_folder)
-            logging.info(f"Waiting 10 minutes before processing the next player...")
-            time.sleep(300)
+        added = sum(queue.enqueue(row['player'], row) for row in csv.DictReader(csvfile))
+    retried = queue.retry_failed()
+    logging.info(f"Queued {added} new or changed players, {retried} previously failed; queue: {queue.counts()}")
+
+    workers = report_config['llm_concurrency']
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report') as executor:
+        running = {}
+        while True:
+            for player_name, row in queue.claim(workers - len(running)):
+                running[executor.submit(process_player, row, output_folder)] = player_name
+            if not running:
+                wait_for = queue.next_due_in()
+                if wait_for is None:
+                    break
+                logging.info(f"Waiting {wait_for:.0f}s for the next retry...")
+                time.sleep(wait_for)
+                continue
+
+            # Wake when a report finishes, or when a backed-off job becomes due and a slot is free
+            due_in = queue.next_due_in() if len(running) < workers else None
+            done, _ = wait(running, timeout=due_in, return_when=FIRST_COMPLETED)
+            for future in done:
+                player_name = running.pop(future)
+                try:
+                    future.result()
+                    queue.complete(player_name)
+                except Exception as e:
+                    status, delay = queue.fail(player_name, e)
+                    if status == 'failed':
+                        logging.error(f"Giving up on {player_name}: {str(e)}")
+                    else:
+                        logging.warning(f"Error processing {player_name}, retrying in {delay:.0f}s: {str(e)}")
+            logging.info(f"Queue: {queue.counts()}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate player outlook reports")
+    parser.add_argument('--refresh', action='store_true', help="regenerate reports that were already produced")
+    args = parser.parse_args()
     input_file = "bot/documents/player_list.csv"
     output_folder = "bot/documents/player_outlook"
-    process_players(input_file, output_folder)
-    logging.info("All players processed. Check the output folder for results.")
\ No newline at end of file
+    process_players(input_file, output_folder, refresh=args.refresh)
+    logging.info("All players processed. Check the output folder for results.")
+    logging.info(f"Web search cache: {search.stats()}, {search_bucket.waited:.0f}s waiting on the search rate limit")
\ No newline at end of file
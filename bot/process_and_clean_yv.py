@@ -1,18 +1,29 @@
 import yaml
 import os
+import sys
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import StrOutputParser
 from langchain.prompts import ChatPromptTemplate
 from langchain_community.llms import Ollama
 from langchain_community.document_loaders import YoutubeLoader
 
+# Shared modules (file_utils, ...) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from file_utils import atomic_write
+
+CLEANER_MODEL = "gemma2:2b"
+CLEAN_CACHE_DIR = os.path.join('data', '.cache', 'cleaned_chunks')
+
 def load_yaml(file_path):
     with open(file_path, 'r') as file:
         return yaml.safe_load(file)
 
-def clean_document(llm, content):
-    prompt = ChatPromptTemplate.from_template("""
+CLEANING_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert NFL fantasy AI assistant tasked with cleaning and  organize the content without losing any information for a RAG (Retrieval-Augmented Generation) system.
     You are an expert in reading large articles about NFL fantasy football and extracting the information from it.
     There is no personal information in the content and do not confuse that there is personal information in the content.
@@ -59,54 +70,122 @@ def clean_document(llm, content):
     Provide the generated content below:
     """)
 
-    
-    chain = prompt | llm | StrOutputParser()
+def clean_document(llm, content):
+    chain = CLEANING_PROMPT | llm | StrOutputParser()
     return chain.invoke({"content": content})
 
+class ChunkCache:
+    # One file per cleaned chunk, named by a hash of the model, the prompt and the raw chunk. Chunks are
+    # saved as soon as they are cleaned, so a crash loses at most the chunks in flight, and editing the
+    # prompt or switching models naturally starts a fresh cache.
+    def __init__(self, cache_dir, model):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._salt = f"{model}\0{CLEANING_PROMPT.messages[0].prompt.template}\0"
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, chunk):
+        digest = hashlib.sha256((self._salt + chunk).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.txt")
+
+    def get(self, chunk):
+        # Counted under the lock: the pool's workers all share one cache
+        try:
+            with open(self._path(chunk), 'r', encoding='utf-8') as f:
+                cleaned = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return cleaned
+
+    def put(self, chunk, cleaned):
+        path = self._path(chunk)
+        with atomic_write(path, 'w', encoding='utf-8') as f:
+            f.write(cleaned)
+
+def clean_chunk(llm, cache, chunk, label):
+    cleaned = cache.get(chunk)
+    if cleaned is not None:
+        return cleaned
+    logging.info(f"Cleaning {label}")
+    cleaned = clean_document(llm, chunk)
+    cache.put(chunk, cleaned)
+    return cleaned
+
+def write_cleaned_video(output_path, channel_name, video_key, video_info, cleaned_chunks):
+    output_file_path = os.path.join(output_path, f"{channel_name}_{video_key}.txt")
+    with atomic_write(output_file_path, 'w', encoding='utf-8') as f:
+        f.write(f"Title: {video_info['title']}\n")
+        f.write(f"Channel: {channel_name}\n")
+        f.write(f"URL: {video_info['url']}\n")
+        f.write(f"Date: {video_info['date']}\n\n")
+        f.write("\n\n".join(cleaned_chunks))
+    return output_file_path
+
+def save_video(output_path, channel_name, video_key, video_info, futures):
+    # Reassembles a video in chunk order once all its chunks are done; a video with a failed chunk is not
+    # written, but its finished chunks stay cached for the next run
+    try:
+        cleaned_chunks = [future.result() for future in futures]
+        output_file_path = write_cleaned_video(output_path, channel_name, video_key, video_info, cleaned_chunks)
+        logging.info(f"Completed processing and saved YouTube video: {video_info['title']} to {output_file_path}")
+    except Exception as e:
+        logging.error(f"Error processing YouTube video {video_key} from channel {channel_name}: {e}")
+
+def when_all_done(futures, callback):
+    # Runs callback on the worker that finishes the last future, so each video is written as soon as it is
+    # complete rather than after the whole batch
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    if not futures:
+        callback()
+    for future in futures:
+        future.add_done_callback(done)
+
 def process_youtube_videos(config_file):
     config = load_yaml(config_file)
-    llm = Ollama(model="gemma2:2b",temperature=0.1)
+    cleaning = config.get('cleaning', {})
+    llm = Ollama(model=CLEANER_MODEL, temperature=0.1)
+    cache = ChunkCache(cleaning.get('cache_dir', CLEAN_CACHE_DIR), CLEANER_MODEL)
     output_path = config['output_path']
     os.makedirs(output_path, exist_ok=True)
 
     # Initial splitter for processing
     process_splitter = RecursiveCharacterTextSplitter(chunk_size=3000, chunk_overlap=500)
 
-    for channel_name, videos in config.get('youtube', {}).items():
-        for video_key, video_info in videos.items():
-            url = video_info['url']
-            title = video_info['title']
-            try:
-                logging.info(f"Loading YouTube video: {title} from channel: {channel_name}")
-                loader = YoutubeLoader.from_youtube_url(url)
-                video_content = loader.load()[0].page_content
-                
+    # Chunks from every video share one pool sized for the local model server (match OLLAMA_NUM_PARALLEL);
+    # transcripts keep downloading while earlier videos are being cleaned
+    with ThreadPoolExecutor(max_workers=cleaning.get('max_workers', 2), thread_name_prefix='clean') as executor:
+        for channel_name, videos in config.get('youtube', {}).items():
+            for video_key, video_info in videos.items():
+                title = video_info['title']
+                try:
+                    logging.info(f"Loading YouTube video: {title} from channel: {channel_name}")
+                    loader = YoutubeLoader.from_youtube_url(video_info['url'])
+                    video_content = loader.load()[0].page_content
+                except Exception as e:
+                    logging.error(f"Error loading YouTube video {video_key} from channel {channel_name}: {e}")
+                    continue
+
                 chunks = process_splitter.split_text(video_content)
-                cleaned_chunks = []
-                
-                for i, chunk in enumerate(chunks, 1):
-                    logging.info(f"Cleaning chunk {i}/{len(chunks)} of video: {title}")
-                    print(f"Cleaning chunk {i}/{len(chunks)} of video: {title}")
-                    #print(f"chunk: {chunk}")
-                    cleaned_chunk = clean_document(llm, chunk)
-                    #print(f"cleaned_chunk: {cleaned_chunk}")
-                    cleaned_chunks.append(cleaned_chunk)
-                
-                # Save cleaned content to a txt file
-                output_file_name = f"{channel_name}_{video_key}.txt"
-                output_file_path = os.path.join(output_path, output_file_name)
-                with open(output_file_path, 'w', encoding='utf-8') as f:
-                    f.write(f"Title: {title}\n")
-                    f.write(f"Channel: {channel_name}\n")
-                    f.write(f"URL: {url}\n")
-                    f.write(f"Date: {video_info['date']}\n\n")
-                    f.write("\n\n".join(cleaned_chunks))
-                
-                logging.info(f"Completed processing and saved YouTube video: {title} to {output_file_path}")
-            except Exception as e:
-                logging.error(f"Error processing YouTube video {video_key} from channel {channel_name}: {e}")
-
-    logging.info("All YouTube videos processed and saved.")
+                futures = [executor.submit(clean_chunk, llm, cache, chunk, f"chunk {i}/{len(chunks)} of video: {title}")
+                           for i, chunk in enumerate(chunks, 1)]
+                when_all_done(futures, partial(save_video, output_path, channel_name, video_key, video_info, futures))
+
+    logging.info(f"All YouTube videos processed and saved ({cache.misses} chunks cleaned, {cache.hits} from cache).")
 
 if __name__ == "__main__":
     config_file = "bot//youtube_source.yml"
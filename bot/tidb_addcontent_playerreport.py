@@ -1,15 +1,23 @@
 import os
+import sys
 import yaml
 from dotenv import load_dotenv
-from langchain_community.vectorstores import TiDBVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 import glob
 import pandas as pd
 import numpy as np
 from langchain.docstore.document import Document
 import re
 
+# Shared modules (player_names, answer_cache, ...) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from player_names import get_player_index
+from answer_cache import mark_ingested
+from player_similarity import rebuild_similarity_table
+from keyword_index import rebuild_keyword_index
+from ingest_manifest import sync_documents
+from embedding_cache import get_cached_embeddings
+
 # Load config
 with open('static/config.yml', 'r') as file:
     config = yaml.safe_load(file)
@@ -22,128 +30,99 @@ load_dotenv()
 tidb_connection_string = os.getenv('TIDB_CONNECTION_URL')
 google_api_key = os.getenv('GOOGLE_API_KEY')
 
-# Initialize Google embedding model
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=google_api_key)
-
-def load_csv_files(directory):
+# Google embedding model behind the shared embedding cache: batches that finished before an interrupted run
+# are not paid for again
+embeddings = get_cached_embeddings(EMBEDDING_MODEL, google_api_key, **config['embedding_cache'])
+
+NUMERICAL_COLUMNS = ['non_ppr_projection', 'ppr_projection', 'bye_week', 'ADP']
+CSV_CHUNK_ROWS = 500
+
+def clean_outlooks(players, outlooks):
+    # One pattern per chunk covering every name part in it; the callback only drops parts of the row's own
+    # name, and the lookarounds keep "Bo" (Bo Nix) from eating the start of "bonus"
+    own_parts = [{part.lower() for part in player.split()} for player in players]
+    vocabulary = sorted(set().union(*own_parts), key=len, reverse=True)
+    if not vocabulary:
+        return outlooks.str.split().str.join(' ')
+    pattern = re.compile(r"(?<!\w)(?:" + '|'.join(map(re.escape, vocabulary)) + r")(?!\w)", flags=re.IGNORECASE)
+    cleaned = pd.Series([pattern.sub(lambda match, own=own: '' if match.group().lower() in own else match.group(),
+                                     outlook)
+                         for own, outlook in zip(own_parts, outlooks)], index=outlooks.index, dtype=object)
+    return cleaned.str.split().str.join(' ')
+
+def metadata_columns(chunk):
+    # Type conversion once per column: numbers become floats (missing ones None), text stays as read
+    columns = {}
+    for column in chunk.columns.drop('Outlook'):
+        values = chunk[column]
+        if pd.api.types.is_numeric_dtype(values):
+            columns[column] = [None if pd.isna(value) else float(value) for value in values.to_numpy(dtype=float)]
+        else:
+            columns[column] = values.tolist()
+    return columns
+
+def prepare_chunk(chunk):
+    for col in NUMERICAL_COLUMNS:
+        chunk[col] = pd.to_numeric(chunk[col], errors='coerce')
+    chunk['rookie'] = np.where(chunk['rookie'] == '', 'No', 'Yes')
+    chunk['Outlook'] = clean_outlooks(chunk['player'], chunk['Outlook'])
+    return chunk
+
+def read_player_chunks(directory, chunk_rows=CSV_CHUNK_ROWS):
+    # The scraper writes one small CSV per player, so files are gathered into chunks of about chunk_rows
+    # rows and the column-wise steps run once per chunk
     all_files = glob.glob(os.path.join(directory, "*.csv"))
     if not all_files:
         raise Exception(f"No CSV files found in directory {directory}")
-    
-    df_from_each_file = (pd.read_csv(f, keep_default_na=False) for f in all_files)
-    
-    try:
-        concatenated_df = pd.concat(df_from_each_file, ignore_index=True)
-    except ValueError as e:
-        raise Exception("Unable to concatenate CSV files. Check if the files are not empty.") from e
-    
-    concatenated_df.reset_index(drop=True, inplace=True)
-    
-    # Convert numerical columns to appropriate types
-    numerical_columns = ['non_ppr_projection', 'ppr_projection', 'bye_week', 'ADP']
-    for col in numerical_columns:
-        concatenated_df[col] = pd.to_numeric(concatenated_df[col], errors='coerce')
-    
-    # Handle 'rookie' column
-    concatenated_df['rookie'] = concatenated_df['rookie'].fillna('No')
-    concatenated_df['rookie'] = np.where(concatenated_df['rookie'] == '', 'No', 'Yes')
-    
-    # Clean the Outlook column
-    def clean_outlook(row):
-        player_name = row['player']
-        outlook = row['Outlook']
-        
-        # Split player name into parts
-        name_parts = player_name.split()
-        
-        # Create a regex pattern to match any part of the name
-        pattern = '|'.join(re.escape(part) for part in name_parts)
-        
-        # Remove player name parts from the outlook
-        cleaned = re.sub(pattern, '', outlook, flags=re.IGNORECASE)
-        
-        # Remove any extra spaces
-        cleaned = ' '.join(cleaned.split())
-        
-        return cleaned
-
-    concatenated_df['Outlook'] = concatenated_df.apply(clean_outlook, axis=1)
-    
-    return concatenated_df
-
-def create_documents_from_dataframe(df):
-    documents = []
-    
-    for _, row in df.iterrows():
-        metadata = row.drop('Outlook').to_dict()
-        
-        # Ensure numerical values are properly formatted for metadata
-        for key, value in metadata.items():
-            if pd.isna(value):
-                metadata[key] = None
-            elif isinstance(value, (int, float)):
-                metadata[key] = float(value)  # Convert all numbers to float for consistency
-            elif key == 'rookie':
-                metadata[key] = 'Yes' if value == 'Yes' else 'No'
-        
-        doc = Document(page_content=row['Outlook'], metadata=metadata)
-        documents.append(doc)
-    
-    return documents
+
+    frames, rows = [], 0
+    for file_path in all_files:
+        frame = pd.read_csv(file_path, keep_default_na=False)
+        frames.append(frame)
+        rows += len(frame)
+        if rows >= chunk_rows:
+            yield prepare_chunk(pd.concat(frames, ignore_index=True))
+            frames, rows = [], 0
+    if frames:
+        yield prepare_chunk(pd.concat(frames, ignore_index=True))
+
+def iter_player_documents(directory):
+    # Documents are built a CSV chunk at a time and handed straight to the ingester, so memory tracks
+    # the chunk size rather than the number of outlooks
+    for chunk in read_player_chunks(directory):
+        columns = metadata_columns(chunk)
+        names = list(columns)
+        for i, outlook in enumerate(chunk['Outlook']):
+            yield Document(page_content=outlook, metadata={name: columns[name][i] for name in names})
 
 def create_or_update_vector_store(docs, embeddings, connection_string, table_name):
-    try:
-        existing_db = TiDBVectorStore.from_existing_vector_table(
-            embedding=embeddings,
-            connection_string=connection_string,
-            table_name=table_name
-        )
-
-        engine = create_engine(connection_string)
-        query = text(f"""
-            SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(meta, '$.player')) as player
-            FROM {table_name}
-            WHERE JSON_EXTRACT(meta, '$.player') IS NOT NULL
-        """)
-
-        with engine.connect() as connection:
-            result = connection.execute(query)
-            existing_players = set(row[0] for row in result)
-
-        new_docs = [doc for doc in docs if doc.metadata['player'] not in existing_players]
-        
-        if new_docs:
-            existing_db.add_documents(new_docs)
-            print(f"Added {len(new_docs)} new player outlooks to the vector store.")
-        else:
-            print("No new player outlooks to add.")
-        
-        db = existing_db
-
-    except Exception as e:
-        print(f"Creating new vector store: {str(e)}")
-        db = TiDBVectorStore.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            table_name=table_name,
-            connection_string=connection_string,
-            distance_strategy="cosine"
-        )
-        print(f"Created new vector store with {len(docs)} player outlooks.")
-    
-    return db
+    # Keyed by canonical player id so "DJ Moore" and "D.J. Moore" are the same row; an updated outlook or
+    # projection re-embeds that player only, and players dropped from the CSVs are deleted
+    name_index = get_player_index()
+    db, stats = sync_documents(
+        docs, lambda doc: name_index.resolve(doc.metadata['player'], learn=True) or doc.metadata['player'],
+        embeddings, connection_string, table_name, prune_unseen=True, ingestion=config['ingestion']
+    )
+    print(f"Embedded {stats['embedded']} new or changed player outlooks, deleted {stats['deleted']} stale, "
+          f"{stats['unchanged']} unchanged.")
+    return db, stats
 
 def main():
-    # Load CSV files
-    df = load_csv_files("bot/documents/player_outlook")
-    print(f"Loaded {df.shape[0]} player records")
-
-    # Create documents from dataframe without chunking
-    documents = create_documents_from_dataframe(df)
-    print(f"Created {len(documents)} player outlook documents")
+    # One document per player outlook, streamed from the CSV files
+    documents = iter_player_documents("bot/documents/player_outlook")
 
     # Create or update vector store
-    db = create_or_update_vector_store(documents, embeddings, tidb_connection_string, PLAYER_INFO_TABLE_NAME)
+    db, stats = create_or_update_vector_store(documents, embeddings, tidb_connection_string, PLAYER_INFO_TABLE_NAME)
+    print(f"Processed {stats['chunks']} player outlook documents")
+    get_player_index().save_aliases()
+
+    if stats['embedded'] or stats['deleted'] or stats['adopted']:
+        mark_ingested(PLAYER_INFO_TABLE_NAME)
+        # Similar players are served from a table built off the stored outlook embeddings, and name lookups
+        # ("J K Dobbins" below) from a BM25 index over the outlooks and their player metadata
+        engine = create_engine(tidb_connection_string)
+        rebuild_similarity_table(engine, PLAYER_INFO_TABLE_NAME)
+        rebuild_keyword_index(engine, PLAYER_INFO_TABLE_NAME)
 
     # Example query with metadata filtering
     query = "J K Dobbins"
@@ -1,19 +1,32 @@
 import os
+import sys
 import yaml
 from dotenv import load_dotenv
 from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import TiDBVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from sqlalchemy import create_engine, text
 
+# Shared modules (answer_cache, ...) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from answer_cache import mark_ingested
+from ingest_manifest import sync_documents
+from embedding_cache import get_cached_embeddings
+from keyword_index import rebuild_keyword_index
+
+# App config (the source lists are loaded separately in main)
+with open('static/config.yml', 'r') as file:
+    app_config = yaml.safe_load(file)
+
+EMBEDDING_MODEL = app_config['EMBEDDING_MODEL']
+
 # Load environment variables
 load_dotenv()
 tidb_connection_string = os.getenv('TIDB_CONNECTION_URL')
 google_api_key = os.getenv('GOOGLE_API_KEY')
 
-# Initialize Google embedding model
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", google_api_key=google_api_key)
+# Google embedding model behind the shared embedding cache: batches that finished before an interrupted run
+# are not paid for again
+embeddings = get_cached_embeddings(EMBEDDING_MODEL, google_api_key, **app_config['embedding_cache'])
 
 TABLE_NAME = "ffyoutube"
 
@@ -54,54 +67,43 @@ def process_articles(config):
 
     return documents
 
-def create_or_update_vector_store(docs, embeddings, connection_string, table_name):
-    try:
-        existing_db = TiDBVectorStore.from_existing_vector_table(
-            embedding=embeddings,
-            connection_string=connection_string,
-            table_name=table_name
-        )
-
-        engine = create_engine(connection_string)
-        query = text(f"""
-            SELECT DISTINCT JSON_UNQUOTE(JSON_EXTRACT(meta, '$.url')) as url 
-            FROM {table_name}
-            WHERE JSON_EXTRACT(meta, '$.url') IS NOT NULL
-        """)
-
-        with engine.connect() as connection:
-            result = connection.execute(query)
-            existing_urls = set(row[0] for row in result)
-
-        new_docs = [doc for doc in docs if doc.metadata['url'] not in existing_urls]
-        
-        if new_docs:
-            existing_db.add_documents(new_docs)
-            print(f"Added {len(new_docs)} new document chunks to the vector store.")
-        else:
-            print("No new documents to add.")
-        
-        db = existing_db
-
-    except Exception as e:
-        print(f"Creating new vector store: {str(e)}")
-        db = TiDBVectorStore.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            table_name=table_name,
-            connection_string=connection_string,
-            distance_strategy="cosine"
-        )
-        print(f"Created new vector store with {len(docs)} document chunks.")
-    
-    return db
+def create_or_update_vector_store(docs, embeddings, connection_string, table_name, configured_urls=None):
+    # Only new or edited transcript chunks are embedded; chunks that disappeared from a transcript are deleted
+    db, stats = sync_documents(docs, lambda doc: doc.metadata['url'], embeddings, connection_string, table_name,
+                               configured_sources=configured_urls, ingestion=app_config['ingestion'])
+    print(f"Embedded {stats['embedded']} new or changed chunks, deleted {stats['deleted']} stale chunks, "
+          f"{stats['unchanged']} unchanged.")
+    return db, stats
+
+def ensure_channel_column(connection_string, table_name):
+    # Generated from meta and indexed, so channel-filtered retrieval is an index lookup, not a JSON scan per row
+    engine = create_engine(connection_string)
+    with engine.begin() as connection:
+        exists = connection.execute(text("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = :table_name AND column_name = 'channel_name'
+        """), {"table_name": table_name}).scalar()
+        if not exists:
+            connection.execute(text(f"""
+                ALTER TABLE {table_name}
+                ADD COLUMN channel_name VARCHAR(128)
+                    AS (JSON_UNQUOTE(JSON_EXTRACT(meta, '$.channel_name'))) VIRTUAL
+            """))
+            connection.execute(text(f"CREATE INDEX idx_channel_name ON {table_name} (channel_name)"))
+            print(f"Added indexed channel_name column to {table_name}.")
 
 def main():
     config_path = 'bot//youtube_source.yml'  
     config = load_config(config_path)
     all_docs = process_articles(config)
     
-    db = create_or_update_vector_store(all_docs, embeddings, tidb_connection_string, TABLE_NAME)
+    configured_urls = {video['url'] for videos in config['youtube'].values() for video in videos.values()}
+    db, stats = create_or_update_vector_store(all_docs, embeddings, tidb_connection_string, TABLE_NAME, configured_urls)
+    ensure_channel_column(tidb_connection_string, TABLE_NAME)
+    if stats['embedded'] or stats['deleted'] or stats['adopted']:
+        mark_ingested(TABLE_NAME)
+        # Name and keyword lookups are served from a BM25 index over the same chunks
+        rebuild_keyword_index(create_engine(tidb_connection_string), TABLE_NAME)
 
     # Example query
     query = "What are the top fantasy football sleepers for 2024?"
@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import os
+import threading
+
+import yaml
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = 'static/config.yml'
+DEFAULT_CHAT_MODEL = "gemini-1.5-flash-001"
+
+
+def store_engine(vector_store):
+    # TiDBVectorStore keeps its SQLAlchemy engine on the underlying TiDBVectorClient
+    client = getattr(vector_store, '_tidb', None)
+    return getattr(client, '_bind', None)
+
+
+class ClientRegistry:
+    # Long-lived clients shared by every request: one pooled engine per vector table, one chat model per
+    # parameter set and the process-wide cached embeddings. Building these per request costs a TLS handshake,
+    # a table compatibility check and a fresh HTTP session each time.
+    def __init__(self, connection_string, google_api_key, embedding_model, engine_args=None, embedding_cache=None,
+                 local_index=None):
+        self.connection_string = connection_string
+        self.google_api_key = google_api_key
+        self.embedding_model = embedding_model
+        self.engine_args = engine_args or {}
+        self.embedding_cache = embedding_cache or {}
+        self.local_index = dict(local_index or {})
+        self._vector_stores = {}
+        self._local_indexes = {}
+        self._chat_models = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        from embedding_cache import get_cached_embeddings
+        return get_cached_embeddings(self.embedding_model, self.google_api_key, **self.embedding_cache)
+
+    def vector_store(self, table_name, embedding=None, connection_string=None):
+        # Searches go to the in-process mirror when it is enabled; TiDB is only contacted to sync it
+        if self.local_index.get('enabled'):
+            return self.local_vector_index(table_name, embedding=embedding, connection_string=connection_string)
+        return self.tidb_vector_store(table_name, embedding=embedding, connection_string=connection_string)
+
+    def tidb_vector_store(self, table_name, embedding=None, connection_string=None):
+        embedding = embedding or self.embeddings
+        connection_string = connection_string or self.connection_string
+        # The store holds a reference to the embedding, so its id stays unique while the entry lives
+        key = (connection_string, table_name, id(embedding))
+        store = self._vector_stores.get(key)
+        if store is None:
+            with self._lock:
+                store = self._vector_stores.get(key)
+                if store is None:
+                    from langchain_community.vectorstores import TiDBVectorStore
+                    logger.info(f"Opening pooled vector store for table: {table_name}")
+                    store = TiDBVectorStore.from_existing_vector_table(
+                        embedding=embedding,
+                        connection_string=connection_string,
+                        table_name=table_name,
+                        engine_args=self.engine_args
+                    )
+                    self._vector_stores[key] = store
+        return store
+
+    def local_vector_index(self, table_name, embedding=None, connection_string=None):
+        embedding = embedding or self.embeddings
+        key = (connection_string or self.connection_string, table_name, id(embedding))
+        index = self._local_indexes.get(key)
+        if index is None:
+            with self._lock:
+                index = self._local_indexes.get(key)
+                if index is None:
+                    from vector_index import LocalVectorIndex
+                    engine_factory = None
+                    if connection_string or self.connection_string:
+                        def engine_factory():
+                            return store_engine(self.tidb_vector_store(table_name, embedding, connection_string))
+                    index = LocalVectorIndex(
+                        table_name, embedding, engine_factory=engine_factory,
+                        index_dir=self.local_index['index_dir'],
+                        sync_interval=self.local_index['sync_interval']
+                    )
+                    self._local_indexes[key] = index
+        return index
+
+    def chat_model(self, model=DEFAULT_CHAT_MODEL, **params):
+        key = (model, json.dumps(params, sort_keys=True))
+        llm = self._chat_models.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._chat_models.get(key)
+                if llm is None:
+                    from langchain_google_genai import ChatGoogleGenerativeAI
+                    logger.info(f"Creating chat model {model} {params}")
+                    llm = ChatGoogleGenerativeAI(model=model, google_api_key=self.google_api_key, **params)
+                    self._chat_models[key] = llm
+        return llm
+
+    def close(self):
+        with self._lock:
+            stores = list(self._vector_stores.items())
+            self._vector_stores.clear()
+            self._local_indexes.clear()
+            self._chat_models.clear()
+        for (_, table_name, _), store in stores:
+            engine = store_engine(store)
+            if engine is None:
+                continue
+            try:
+                engine.dispose()
+                logger.info(f"Closed connection pool for {table_name}")
+            except Exception as e:
+                logger.error(f"Error closing connection pool for {table_name}: {str(e)}")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_clients(config_path=CONFIG_PATH):
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                load_dotenv()
+                with open(config_path, 'r') as file:
+                    config = yaml.safe_load(file)
+                _registry = ClientRegistry(
+                    os.getenv('TIDB_CONNECTION_URL'),
+                    os.getenv('GOOGLE_API_KEY'),
+                    config['EMBEDDING_MODEL'],
+                    engine_args=config['clients'],
+                    embedding_cache=config['embedding_cache'],
+                    local_index=config['local_index']
+                )
+                atexit.register(_registry.close)
+    return _registry
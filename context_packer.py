@@ -0,0 +1,99 @@
+import math
+import re
+
+CHARS_PER_TOKEN = 4
+# Zero-width breaks keep the separators, so joining the pieces gives back the original text
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])(?=\s)|(?<=\n)')
+# Shorter pieces (headings, "Overview") legitimately repeat across documents
+MIN_DUPLICATE_CHARS = 20
+
+
+def estimate_tokens(text):
+    # Gemini averages about four characters per English token; close enough to budget a prompt
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _sentences(text):
+    return [s for s in _SENTENCE_BREAK.split(text) if s]
+
+
+class ContextPacker:
+    # Dedupes retrieved passages, ranks them by retrieval rank weighted by source, and keeps the best
+    # ones until the token budget is spent. Failure notices always survive: the prompt tells the model
+    # to mention retrieval problems.
+    def __init__(self, token_budget=3000, source_weights=None, min_passage_tokens=48):
+        self.token_budget = token_budget
+        self.source_weights = source_weights or {}
+        self.min_passage_tokens = min_passage_tokens
+
+    def _dedupe(self, contexts):
+        # Splitter overlaps repeat whole sentences (or the tail of one) from the previous chunk;
+        # drop any sentence already contained in text we kept
+        seen = ''
+        unique, duplicates = [], 0
+        for ctx in contexts:
+            if ctx.get('failed'):
+                unique.append(ctx)
+                continue
+            kept = [s for s in _sentences(ctx['content'])
+                    if len(_normalize(s)) < MIN_DUPLICATE_CHARS or _normalize(s) not in seen]
+            content = ''.join(kept).strip()
+            if len(_normalize(content)) < MIN_DUPLICATE_CHARS:
+                duplicates += 1
+                continue
+            seen += ' ' + _normalize(content)
+            unique.append(dict(ctx, content=content))
+        return unique, duplicates
+
+    def _truncate(self, content, tokens):
+        # Whole sentences only, so the model never sees a clipped claim
+        kept, used = [], 0
+        for sentence in _sentences(content):
+            cost = estimate_tokens(sentence)
+            if used + cost > tokens:
+                break
+            kept.append(sentence)
+            used += cost
+        return ''.join(kept).strip()
+
+    def priority(self, ctx):
+        return self.source_weights.get(ctx['source'], 1.0) / (1 + ctx.get('rank', 0))
+
+    def pack(self, contexts):
+        input_tokens = sum(estimate_tokens(ctx['content']) for ctx in contexts)
+        unique, duplicates = self._dedupe(contexts)
+
+        remaining = self.token_budget - sum(estimate_tokens(ctx['content']) for ctx in unique if ctx.get('failed'))
+        chosen = {}
+        dropped = truncated = 0
+        order = sorted((i for i, ctx in enumerate(unique) if not ctx.get('failed')),
+                       key=lambda i: self.priority(unique[i]), reverse=True)
+        for i in order:
+            ctx = unique[i]
+            tokens = estimate_tokens(ctx['content'])
+            if tokens <= remaining:
+                chosen[i] = ctx
+                remaining -= tokens
+                continue
+            content = self._truncate(ctx['content'], remaining) if remaining >= self.min_passage_tokens else ''
+            if content:
+                chosen[i] = dict(ctx, content=content)
+                remaining -= estimate_tokens(content)
+                truncated += 1
+            else:
+                dropped += 1
+
+        # Back in retrieval order so the prompt reads the same way it did before packing
+        packed = [chosen.get(i, ctx) for i, ctx in enumerate(unique) if ctx.get('failed') or i in chosen]
+        report = {
+            'input_tokens': input_tokens,
+            'packed_tokens': sum(estimate_tokens(ctx['content']) for ctx in packed),
+            'duplicates_removed': duplicates,
+            'passages_dropped': dropped,
+            'passages_truncated': truncated,
+        }
+        return packed, report
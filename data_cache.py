@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from file_utils import atomic_write, file_digest, temp_path
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join('data', '.cache', 'tables')
+CACHE_FORMAT = 2
+
+# Tables the app and the notebooks read over and over
+DEFAULT_TABLES = {
+    'data/cbs_fantasy_projection_master.csv': {'numeric_columns': ['ADP']},
+    'results/player_outlook.csv': {},
+    'results/first_3_years_avg_stats.csv': {},
+    'results/last_3_years_avg_stats.csv': {},
+    'results/2023_season_stats.csv': {},
+}
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _cache_path(csv_path, options, cache_dir):
+    # Keyed on the resolved path, so same-named CSVs in different directories don't share an entry, and on
+    # the read options, since different options produce different frames
+    key = json.dumps([os.path.realpath(csv_path), options], sort_keys=True)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+
+
+def _read_csv(csv_path, numeric_columns=None, **read_csv_kwargs):
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    for col in numeric_columns or []:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _group_file(dtype):
+    return f"numeric{dtype.replace('<', '_').replace('>', '_').replace('|', '_')}.npy"
+
+
+def compile_table(csv_path, cache_path, source_sha1=None, numeric_columns=None, **read_csv_kwargs):
+    df = _read_csv(csv_path, numeric_columns=numeric_columns, **read_csv_kwargs)
+
+    tmp_path = temp_path(cache_path)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    numeric_groups = {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if series.dtype.kind in 'biuf':
+            # Same-dtype numeric columns share one column-major matrix: one file, one mmap
+            group = numeric_groups.setdefault(series.dtype.str, [])
+            columns.append({'name': str(col), 'kind': 'numeric', 'group': series.dtype.str, 'index': len(group)})
+            group.append(series.to_numpy())
+            continue
+
+        na = series.isna().to_numpy()
+        values = series.to_numpy(dtype=object)
+        if all(isinstance(v, str) for v in values[~na]):
+            # Fixed-width unicode loads without unpickling; the mask restores missing values
+            np.save(os.path.join(tmp_path, f"{i}.npy"), np.where(na, '', values).astype(str))
+            np.save(os.path.join(tmp_path, f"{i}.na.npy"), na)
+            kind = 'str'
+        else:
+            np.save(os.path.join(tmp_path, f"{i}.npy"), values, allow_pickle=True)
+            kind = 'object'
+        columns.append({'name': str(col), 'kind': kind})
+
+    for dtype, arrays in numeric_groups.items():
+        np.save(os.path.join(tmp_path, _group_file(dtype)), np.asfortranarray(np.column_stack(arrays)))
+
+    manifest = {
+        'format': CACHE_FORMAT,
+        'source': csv_path,
+        'source_sha1': source_sha1 or file_digest(csv_path),
+        'source_signature': _signature(csv_path),
+        'rows': len(df),
+        'columns': columns,
+    }
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+    logger.info(f"Compiled {csv_path} into {cache_path} ({len(df)} rows)")
+    return df
+
+
+def _load_compiled(cache_path, manifest):
+    data = {}
+    groups = {}
+    for i, column in enumerate(manifest['columns']):
+        path = os.path.join(cache_path, f"{i}.npy")
+        if column['kind'] == 'numeric':
+            if column['group'] not in groups:
+                groups[column['group']] = np.asarray(
+                    np.load(os.path.join(cache_path, _group_file(column['group'])), mmap_mode='r'))
+            data[column['name']] = groups[column['group']][:, column['index']]
+        elif column['kind'] == 'str':
+            values = np.load(path, mmap_mode='r').astype(object)
+            values[np.load(os.path.join(cache_path, f"{i}.na.npy"))] = np.nan
+            data[column['name']] = values
+        else:
+            data[column['name']] = np.load(path, allow_pickle=True)
+    return pd.DataFrame(data, copy=False)
+
+
+def _read_manifest(cache_path):
+    try:
+        with open(os.path.join(cache_path, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == CACHE_FORMAT else None
+
+
+def load_table(csv_path, cache_dir=CACHE_DIR, numeric_columns=None, **read_csv_kwargs):
+    options = {'numeric_columns': numeric_columns or [], **read_csv_kwargs}
+    try:
+        cache_path = _cache_path(csv_path, options, cache_dir)
+        manifest = _read_manifest(cache_path)
+        if manifest is not None:
+            signature = _signature(csv_path)
+            if manifest['source_signature'] == signature:
+                return _load_compiled(cache_path, manifest)
+            # Touched but maybe not edited: only a content change forces a re-parse
+            source_sha1 = file_digest(csv_path)
+            if manifest['source_sha1'] == source_sha1:
+                manifest['source_signature'] = signature
+                with atomic_write(os.path.join(cache_path, 'manifest.json')) as f:
+                    json.dump(manifest, f)
+                return _load_compiled(cache_path, manifest)
+        else:
+            source_sha1 = None
+        os.makedirs(cache_dir, exist_ok=True)
+        return compile_table(csv_path, cache_path, source_sha1=source_sha1, numeric_columns=numeric_columns,
+                             **read_csv_kwargs)
+    except OSError as e:
+        logger.warning(f"Table cache unavailable for {csv_path}, parsing CSV: {str(e)}")
+        return _read_csv(csv_path, numeric_columns=numeric_columns, **read_csv_kwargs)
+
+
+def benchmark(tables=None, repeat=5):
+    tables = tables or DEFAULT_TABLES
+    print(f"{'table':<45} {'csv ms':>10} {'cache ms':>10} {'speedup':>8}")
+    for csv_path, options in tables.items():
+        if not os.path.exists(csv_path):
+            continue
+        load_table(csv_path, **options)  # warm the cache
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _read_csv(csv_path, **options)
+        csv_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            load_table(csv_path, **options)
+        cache_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        print(f"{csv_path:<45} {csv_ms:>10.2f} {cache_ms:>10.2f} {csv_ms / cache_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    benchmark()
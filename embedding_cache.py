@@ -0,0 +1,163 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join('data', '.cache', 'embeddings.sqlite')
+
+
+def normalize_text(text):
+    return ' '.join(str(text).split()).lower()
+
+
+class CachedEmbeddings(Embeddings):
+    # Wraps any langchain Embeddings with an in-memory LRU backed by sqlite. Keys include the
+    # model and whether the text was embedded as a query or a document, since the API embeds them differently.
+    def __init__(self, embeddings, model, max_entries=4096, cache_path=DEFAULT_CACHE_PATH):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+        self._db = None
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                self._db = sqlite3.connect(cache_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings "
+                    "(model TEXT, kind TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, kind, text))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding disk cache disabled ({cache_path}): {str(e)}")
+                self._db = None
+
+    def _get(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits['memory'] += 1
+                return vector
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND kind = ? AND text = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+            self._remember(key, vector)
+            self.hits['disk'] += 1
+            return vector
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put_many(self, items):
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                        [(*key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not persist embeddings: {str(e)}")
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model, 'query', normalize_text(text))
+        vector = self._get(key)
+        if vector is not None:
+            return vector
+
+        # Concurrent retrievers asking for the same question wait on one API call
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            vector = self._get(key)
+            if vector is not None:
+                return vector
+
+        try:
+            with self._lock:
+                self.misses += 1
+            vector = self.embeddings.embed_query(text)
+            self._put_many([(key, vector)])
+            return vector
+        finally:
+            if leader:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [(self.model, 'document', normalize_text(text)) for text in texts]
+        vectors = [self._get(key) for key in keys]
+        # First occurrence of each uncached key; repeats within the batch reuse its vector
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            computed = self.embeddings.embed_documents([texts[i] for i in missing.values()])
+            fresh = dict(zip(missing, computed))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+            self._put_many(list(fresh.items()))
+        return vectors
+
+    def stats(self):
+        with self._lock:
+            memory_hits, disk_hits, misses, entries = self.hits['memory'], self.hits['disk'], self.misses, len(self._memory)
+        total = memory_hits + disk_hits + misses
+        return {
+            'model': self.model,
+            'memory_hits': memory_hits,
+            'disk_hits': disk_hits,
+            'misses': misses,
+            'hit_rate': round((memory_hits + disk_hits) / total, 4) if total else 0.0,
+            'memory_entries': entries,
+        }
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_cached_embeddings(model, google_api_key, max_entries=4096, cache_path=DEFAULT_CACHE_PATH):
+    # One cache per model for the whole process, so every retriever shares hits
+    with _shared_lock:
+        if model not in _shared:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            embeddings = GoogleGenerativeAIEmbeddings(model=model, google_api_key=google_api_key)
+            _shared[model] = CachedEmbeddings(embeddings, model, max_entries=max_entries, cache_path=cache_path)
+        return _shared[model]
+
+
+def embedding_stats():
+    with _shared_lock:
+        return [cache.stats() for cache in _shared.values()]
@@ -0,0 +1,32 @@
+import contextlib
+import hashlib
+import os
+import threading
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def temp_path(path):
+    # Unique per process and thread, next to the target so the final rename stays on one filesystem
+    return f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', **open_kwargs):
+    # Readers see the old file or the new one, never a partial write; concurrent writers of the same path
+    # each get their own temp file and the last rename wins
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, mode, **open_kwargs) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
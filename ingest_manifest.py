@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from collections import defaultdict
+
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = os.path.join('data', '.cache', 'ingest')
+KEY_FIELD = 'ingest_key'
+HASH_FIELD = 'content_hash'
+ROW_ID_NAMESPACE = uuid.UUID('5b0f8a52-3d1e-4c55-9a57-2f6f1c8e7d10')
+
+
+def content_hash(text, metadata):
+    # Metadata counts too: a new projection or ADP has to reach the stored row even if the outlook text is unchanged
+    metadata = {key: value for key, value in metadata.items() if key not in (KEY_FIELD, HASH_FIELD)}
+    payload = json.dumps([text, metadata], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def keyed_documents(docs, source_key, keep_doc=None):
+    # A chunk's key is its source (article URL, player id) plus its position in that source, so an edit
+    # replaces the chunks it touched and a source that got shorter loses its tail. `docs` may be a
+    # generator; with keep_doc(key, hash) only the documents that will be embedded are held in memory
+    positions = defaultdict(int)
+    entries = {}
+    for doc in docs:
+        source = source_key(doc)
+        key = f"{source}#{positions[source]}"
+        positions[source] += 1
+        digest = content_hash(doc.page_content, doc.metadata)
+        doc.metadata[KEY_FIELD] = key
+        doc.metadata[HASH_FIELD] = digest
+        # The id changes with the content, so new rows can be written before the old ones are removed
+        row_id = str(uuid.uuid5(ROW_ID_NAMESPACE, f"{key}:{digest}"))
+        keep = keep_doc is None or keep_doc(key, digest)
+        entries[key] = {'id': row_id, 'hash': digest, 'source': source, 'doc': doc if keep else None}
+    return entries
+
+
+def ensure_key_columns(engine, table_name):
+    # Generated from meta and indexed, so rebuilding the manifest reads the index instead of every row's JSON
+    from sqlalchemy import text
+    with engine.begin() as connection:
+        existing = {row[0] for row in connection.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = :table_name
+        """), {"table_name": table_name})}
+        if KEY_FIELD not in existing:
+            connection.execute(text(f"""
+                ALTER TABLE {table_name}
+                ADD COLUMN {KEY_FIELD} VARCHAR(512)
+                    AS (JSON_UNQUOTE(JSON_EXTRACT(meta, '$.{KEY_FIELD}'))) VIRTUAL,
+                ADD COLUMN {HASH_FIELD} CHAR(32)
+                    AS (JSON_UNQUOTE(JSON_EXTRACT(meta, '$.{HASH_FIELD}'))) VIRTUAL
+            """))
+            connection.execute(text(f"CREATE INDEX idx_{KEY_FIELD} ON {table_name} ({KEY_FIELD}, {HASH_FIELD})"))
+            logger.info(f"Added indexed {KEY_FIELD}/{HASH_FIELD} columns to {table_name}")
+
+
+class IngestManifest:
+    # Local record of what each vector table holds: chunk key -> row id, content hash and source. A run
+    # only embeds chunks whose hash changed and deletes chunks that disappeared from their source.
+    # Delete the file to rebuild it from the table's key/hash columns.
+    def __init__(self, table_name, manifest_dir=MANIFEST_DIR):
+        self.table_name = table_name
+        self.path = os.path.join(manifest_dir, f"{table_name}.json")
+        self.rows = {}
+
+    def load(self, engine):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.rows = json.load(f)
+                return 'file'
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring ingest manifest for {self.table_name}: {str(e)}")
+        from sqlalchemy import text
+        with engine.connect() as connection:
+            result = connection.execute(text(
+                f"SELECT id, {KEY_FIELD}, {HASH_FIELD} FROM {self.table_name} WHERE {KEY_FIELD} IS NOT NULL"
+            ))
+            self.rows = {key: {'id': row_id, 'hash': digest, 'source': key.rsplit('#', 1)[0]}
+                         for row_id, key, digest in result}
+        return 'table'
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_write(self.path, 'w') as f:
+            json.dump(self.rows, f)
+
+    def adopt_legacy_rows(self, engine, entries, source_key):
+        # Rows written before the manifest existed have no key. Ones whose content matches a current chunk
+        # are tagged in place instead of re-embedded; the rest are returned for deletion if their source
+        # was part of this run.
+        from langchain_core.documents import Document
+        from sqlalchemy import text
+
+        by_hash = {entry['hash']: key for key, entry in entries.items()}
+        adopted, orphans = [], []
+        with engine.connect() as connection:
+            legacy = list(connection.execute(text(
+                f"SELECT id, document, meta FROM {self.table_name} WHERE {KEY_FIELD} IS NULL"
+            )))
+        for row_id, document, meta in legacy:
+            metadata = json.loads(meta) if isinstance(meta, (str, bytes)) else (meta or {})
+            key = by_hash.get(content_hash(document, metadata))
+            if key is not None and key not in self.rows:
+                adopted.append({'id': row_id, 'key': key, 'hash': entries[key]['hash']})
+                self.rows[key] = {'id': row_id, 'hash': entries[key]['hash'], 'source': entries[key]['source']}
+            else:
+                orphans.append((row_id, source_key(Document(page_content=document, metadata=metadata))))
+        if adopted:
+            with engine.begin() as connection:
+                connection.execute(text(
+                    f"UPDATE {self.table_name} SET meta = JSON_SET(meta, '$.{KEY_FIELD}', :key, "
+                    f"'$.{HASH_FIELD}', :hash) WHERE id = :id"
+                ), adopted)
+        return len(adopted), orphans
+
+    def plan(self, entries, configured_sources=None):
+        # A source that produced no chunks this run (file missing, fetch failed) keeps its rows; it is only
+        # dropped once it leaves the configuration
+        seen = {entry['source'] for entry in entries.values()}
+        changed = [key for key, entry in entries.items()
+                   if self.rows.get(key, {}).get('hash') != entry['hash']]
+        stale = [key for key, row in self.rows.items()
+                 if key not in entries and (row['source'] in seen or
+                                            (configured_sources is not None and row['source'] not in configured_sources))]
+        return changed, stale
+
+
+def sync_documents(docs, source_key, embeddings, connection_string, table_name, configured_sources=None,
+                   prune_unseen=False, manifest_dir=MANIFEST_DIR, ingestion=None):
+    # configured_sources: sources still in the configuration; prune_unseen treats every source this run
+    # produced as the configuration, for inputs (like the player CSVs) that are the full source list
+    from langchain_community.vectorstores import TiDBVectorStore
+    from sqlalchemy import create_engine
+
+    from batch_ingest import BatchIngester
+
+    # Creates the table on first use
+    db = TiDBVectorStore(connection_string=connection_string, embedding_function=embeddings,
+                         table_name=table_name, distance_strategy="cosine")
+    engine = create_engine(connection_string)
+    ensure_key_columns(engine, table_name)
+
+    manifest = IngestManifest(table_name, manifest_dir)
+    loaded_from = manifest.load(engine)
+    entries = keyed_documents(docs, source_key,
+                              keep_doc=lambda key, digest: manifest.rows.get(key, {}).get('hash') != digest)
+    seen = {entry['source'] for entry in entries.values()}
+    if prune_unseen:
+        configured_sources = seen
+    adopted, orphans = manifest.adopt_legacy_rows(engine, entries, source_key)
+    changed, stale = manifest.plan(entries, configured_sources)
+    orphan_ids = [row_id for row_id, source in orphans
+                  if source in seen or (configured_sources is not None and source not in configured_sources)]
+
+    failed = []
+    if changed:
+        ingester = BatchIngester(embeddings, engine, table_name, **(ingestion or {}))
+        stored, _ = ingester.ingest([entries[key]['id'] for key in changed],
+                                   [entries[key]['doc'].page_content for key in changed],
+                                   [entries[key]['doc'].metadata for key in changed])
+        # A chunk whose new row could not be written keeps its old row and is retried next run
+        failed = [key for key in changed if entries[key]['id'] not in stored]
+        changed = [key for key in changed if entries[key]['id'] in stored]
+    old_ids = [manifest.rows[key]['id'] for key in changed + stale if key in manifest.rows] + orphan_ids
+    if old_ids:
+        db.delete(ids=old_ids)
+
+    for key in changed:
+        entry = entries[key]
+        manifest.rows[key] = {'id': entry['id'], 'hash': entry['hash'], 'source': entry['source']}
+    for key in stale:
+        del manifest.rows[key]
+    manifest.save()
+
+    stats = {
+        'chunks': len(entries),
+        'embedded': len(changed),
+        'deleted': len(stale) + len(orphan_ids),
+        'unchanged': len(entries) - len(changed) - len(failed),
+        'failed': len(failed),
+        'adopted': adopted,
+        'manifest': loaded_from,
+    }
+    logger.info(f"Synced {table_name}: {stats}")
+    return db, stats
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = os.path.join('data', '.cache', 'jobs.sqlite')
+
+
+def payload_hash(payload):
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class JobQueue:
+    # Durable work queue in sqlite: one row per job key with its payload, status, attempt count and the
+    # earliest time it may run again. Jobs that were running when the process died go back to pending on
+    # open, so a restarted run picks up where the last one stopped. A job that used up its attempts is
+    # 'failed'; retry_failed gives it another round at most max_revivals times, then it is 'dead'.
+    # Re-enqueueing a key with a different payload, or refresh(), puts a finished job back to pending.
+    def __init__(self, name, path=DEFAULT_QUEUE_PATH, max_attempts=4, retry_base_delay=60.0, retry_max_delay=3600.0,
+                 max_revivals=2):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_revivals = max_revivals
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs "
+            "(queue TEXT, key TEXT, payload TEXT, status TEXT, attempts INTEGER, last_error TEXT, "
+            "not_before REAL, updated_at REAL, revivals INTEGER DEFAULT 0, payload_hash TEXT, PRIMARY KEY (queue, key))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if 'revivals' not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN revivals INTEGER DEFAULT 0")
+        if 'payload_hash' not in columns:
+            # Hash what older queue files stored, so upgrading does not re-run every finished job
+            self._db.execute("ALTER TABLE jobs ADD COLUMN payload_hash TEXT")
+            self._db.executemany(
+                "UPDATE jobs SET payload_hash = ? WHERE queue = ? AND key = ?",
+                [(payload_hash(json.loads(payload)), queue, key)
+                 for queue, key, payload in self._db.execute("SELECT queue, key, payload FROM jobs").fetchall()]
+            )
+        recovered = self._db.execute(
+            "UPDATE jobs SET status = 'pending' WHERE queue = ? AND status = 'running'", (name,)
+        ).rowcount
+        self._db.commit()
+        if recovered:
+            logger.info(f"{name}: {recovered} interrupted job(s) returned to the queue")
+
+    def enqueue(self, key, payload):
+        # Unchanged jobs keep their status, so re-running with the same input only adds what is new; a job
+        # whose payload changed (new ADP or projection) starts over as pending with the new payload
+        with self._lock:
+            added = self._db.execute(
+                "INSERT INTO jobs (queue, key, payload, status, attempts, last_error, not_before, updated_at, "
+                "revivals, payload_hash) VALUES (?, ?, ?, 'pending', 0, NULL, 0, ?, 0, ?) "
+                "ON CONFLICT (queue, key) DO UPDATE SET payload = excluded.payload, "
+                "payload_hash = excluded.payload_hash, status = 'pending', attempts = 0, last_error = NULL, "
+                "not_before = 0, updated_at = excluded.updated_at, revivals = 0 "
+                "WHERE jobs.payload_hash IS NOT excluded.payload_hash",
+                (self.name, key, json.dumps(payload), time.time(), payload_hash(payload))
+            ).rowcount
+            self._db.commit()
+        return added
+
+    def refresh(self):
+        # Re-runs every job that is not in flight: finished, failed and dead ones go back to pending
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, last_error = NULL, not_before = 0, revivals = 0, "
+                "updated_at = ? WHERE queue = ? AND status NOT IN ('pending', 'running')",
+                (time.time(), self.name)
+            ).rowcount
+            self._db.commit()
+        return count
+
+    def retry_failed(self):
+        # Failed jobs whose cool-down has passed get a fresh round of attempts; ones already revived
+        # max_revivals times are parked as dead and cost nothing on later runs
+        with self._lock:
+            dead = self._db.execute(
+                "UPDATE jobs SET status = 'dead', updated_at = ? WHERE queue = ? AND status = 'failed' AND revivals >= ?",
+                (time.time(), self.name, self.max_revivals)
+            ).rowcount
+            count = self._db.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, revivals = revivals + 1 "
+                "WHERE queue = ? AND status = 'failed' AND not_before <= ?",
+                (self.name, time.time())
+            ).rowcount
+            self._db.commit()
+        if dead:
+            logger.warning(f"{self.name}: {dead} job(s) failed {self.max_revivals + 1} rounds and are now dead")
+        return count
+
+    def claim(self, limit):
+        # Due pending jobs, oldest first, marked running in the same transaction
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, payload FROM jobs WHERE queue = ? AND status = 'pending' AND not_before <= ? "
+                "ORDER BY updated_at LIMIT ?", (self.name, time.time(), limit)
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE queue = ? AND key = ?",
+                [(time.time(), self.name, key) for key, _ in rows]
+            )
+            self._db.commit()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def complete(self, key):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ? WHERE queue = ? AND key = ?",
+                (time.time(), self.name, key)
+            )
+            self._db.commit()
+
+    def fail(self, key, error):
+        # Backs off exponentially with jitter; after max_attempts the job is parked as failed, and the
+        # cool-down before retry_failed may revive it doubles with every round
+        with self._lock:
+            attempts, revivals = self._db.execute(
+                "SELECT attempts, revivals FROM jobs WHERE queue = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            attempts += 1
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            if status == 'failed':
+                delay = self.retry_max_delay * 2 ** (revivals or 0)
+            else:
+                delay = random.uniform(0.5, 1.0) * min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+            self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, last_error = ?, not_before = ?, updated_at = ? "
+                "WHERE queue = ? AND key = ?",
+                (status, attempts, str(error)[:1000], time.time() + delay, time.time(), self.name, key)
+            )
+            self._db.commit()
+        return status, delay
+
+    def next_due_in(self):
+        # Seconds until the earliest pending job may run; None when nothing is pending
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(not_before) FROM jobs WHERE queue = ? AND status = 'pending'", (self.name,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.name,)
+            ).fetchall()
+        return dict(rows)
@@ -0,0 +1,204 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.documents import Document
+
+from file_utils import atomic_write
+from vector_index import matches_filter
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_INDEX_DIR = os.path.join('data', '.cache', 'keywords')
+# Player outlooks have the player's own name stripped from the text, so names and teams come from metadata
+KEYWORD_FIELDS = ('player', 'team', 'title', 'channel_name')
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'he', 'his', 'in',
+    'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with',
+}
+
+
+def tokenize(text):
+    # Same folding as the player gazetteer: "J.K. Dobbins" and "J K Dobbins" both give j, k, dobbins
+    tokens = re.split(r'[^a-z0-9]+', re.sub(r"['`]", '', str(text).lower()))
+    return [t for t in tokens if t and t not in STOP_WORDS]
+
+
+def keyword_text(document, metadata):
+    fields = ' '.join(str(metadata[field]) for field in KEYWORD_FIELDS if metadata.get(field))
+    return f"{fields} {document}"
+
+
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    # Each ranking is a list of Documents, best first; a passage found by both retrievers rises to the top
+    scores = defaultdict(float)
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc.page_content] += 1.0 / (k + rank + 1)
+            docs.setdefault(doc.page_content, doc)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [docs[content] for content in fused[:limit]]
+
+
+class KeywordIndex:
+    # BM25 over one vector table's documents. Postings are flat arrays (doc index and term frequency per
+    # term, sliced by offset) in memory-mapped .npy files; the ingestion bots rebuild them and searches
+    # pick up the new revision by the manifest's mtime.
+    def __init__(self, table_name, index_dir=KEYWORD_INDEX_DIR, k1=1.5, b=0.75):
+        self.table_name = table_name
+        self.path = os.path.join(index_dir, table_name)
+        self.k1 = k1
+        self.b = b
+        self._state = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def build(self, rows):
+        # rows: (document, metadata) pairs
+        documents, metadatas, counts = [], [], []
+        for document, meta in rows:
+            metadata = json.loads(meta) if isinstance(meta, (str, bytes)) else (meta or {})
+            documents.append(document or '')
+            metadatas.append(metadata)
+            counts.append(Counter(tokenize(keyword_text(document or '', metadata))))
+
+        postings = defaultdict(list)
+        for doc_index, counter in enumerate(counts):
+            for term, tf in counter.items():
+                postings[term].append((doc_index, tf))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.fromiter((d for term in terms for d, _ in postings[term]), dtype=np.int32, count=offsets[-1])
+        tfs = np.fromiter((tf for term in terms for _, tf in postings[term]), dtype=np.float32, count=offsets[-1])
+        lengths = np.asarray([sum(counter.values()) for counter in counts], dtype=np.float32)
+
+        os.makedirs(self.path, exist_ok=True)
+        revision = time.time_ns()
+        for name, array in (('offsets', offsets), ('docs', doc_ids), ('tfs', tfs), ('lengths', lengths)):
+            np.save(os.path.join(self.path, f"{name}-{revision}.npy"), array)
+        manifest_path = os.path.join(self.path, 'terms.json')
+        with atomic_write(manifest_path, 'w') as f:
+            json.dump({'revision': revision, 'terms': terms, 'documents': documents, 'metadatas': metadatas}, f)
+        for name in os.listdir(self.path):
+            if name.endswith('.npy') and not name.endswith(f"-{revision}.npy"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        logger.info(f"Built keyword index for {self.table_name}: {len(documents)} documents, {len(terms)} terms")
+        return len(documents)
+
+    def _current(self):
+        manifest_path = os.path.join(self.path, 'terms.json')
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(manifest_path) as f:
+                            manifest = json.load(f)
+                        arrays = {name: np.load(os.path.join(self.path, f"{name}-{manifest['revision']}.npy"),
+                                                mmap_mode='r')
+                                  for name in ('offsets', 'docs', 'tfs', 'lengths')}
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning(f"Ignoring keyword index for {self.table_name}: {str(e)}")
+                        return self._state
+                    lengths = arrays['lengths']
+                    self._state = dict(
+                        arrays,
+                        terms={term: i for i, term in enumerate(manifest['terms'])},
+                        documents=manifest['documents'],
+                        metadatas=manifest['metadatas'],
+                        average_length=float(lengths.mean()) if len(lengths) else 0.0,
+                    )
+                    self._mtime = mtime
+        return self._state
+
+    @property
+    def available(self):
+        state = self._current()
+        return state is not None and len(state['documents']) > 0
+
+    def search_with_score(self, query, k=4, filter=None):
+        state = self._current()
+        if state is None or not state['documents']:
+            return []
+        n = len(state['documents'])
+        scores = np.zeros(n, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * state['lengths'] / (state['average_length'] or 1.0))
+        for term in set(tokenize(query)):
+            i = state['terms'].get(term)
+            if i is None:
+                continue
+            start, end = state['offsets'][i], state['offsets'][i + 1]
+            docs = state['docs'][start:end]
+            tfs = state['tfs'][start:end]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            # A term occurs once per posting list entry, so docs has no repeats and += is safe
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norms[docs])
+
+        candidates = np.flatnonzero(scores > 0)
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        results = []
+        for i in candidates:
+            metadata = state['metadatas'][i]
+            if filter and not matches_filter(metadata, filter):
+                continue
+            results.append((Document(page_content=state['documents'][i], metadata=metadata), float(scores[i])))
+            if len(results) == k:
+                break
+        return results
+
+    def search(self, query, k=4, filter=None):
+        return [doc for doc, _ in self.search_with_score(query, k=k, filter=filter)]
+
+
+def rebuild_keyword_index(engine, table_name, index_dir=KEYWORD_INDEX_DIR):
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        rows = list(conn.execute(text(f"SELECT document, meta FROM `{table_name}`")))
+    return KeywordIndex(table_name, index_dir=index_dir).build(rows)
+
+
+_keyword_indexes = {}
+_keyword_lock = threading.Lock()
+
+
+def get_keyword_index(table_name, index_dir=KEYWORD_INDEX_DIR):
+    key = (index_dir, table_name)
+    if key not in _keyword_indexes:
+        with _keyword_lock:
+            if key not in _keyword_indexes:
+                _keyword_indexes[key] = KeywordIndex(table_name, index_dir=index_dir)
+    return _keyword_indexes[key]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import yaml
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    parser = argparse.ArgumentParser(description="Rebuild the BM25 keyword indexes from the TiDB vector tables")
+    parser.add_argument('tables', nargs='*', help="table names (default: every table in static/config.yml)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    with open('static/config.yml', 'r') as file:
+        config = yaml.safe_load(file)
+    engine = create_engine(os.getenv('TIDB_CONNECTION_URL'))
+    for table in args.tables or config['vectordb'].values():
+        rebuild_keyword_index(engine, table, config['keyword_index']['index_dir'])
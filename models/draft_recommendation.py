@@ -1,13 +1,16 @@
-import pandas as pd
-import numpy as np
+import os
 import pickle
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+from file_utils import atomic_write
+
+SNAPSHOT_VERSION = 1
 
 class FantasyFootballDraftAssistant:
     def __init__(self):
-        self.df = None
+        self._df = None
+        self._name_index = None
+        self.players = []
         self.positions = {'QB': (1, 2), 'RB': (6, 9), 'WR': (5, 9), 'TE': (1, 2), 'K': (1, 1), 'DST': (1, 1)}
         self.starting_positions = {'QB': 1, 'RB': 2, 'WR': 3, 'TE': 1, 'K': 1, 'DST': 1, 'FLEX': 1}
         self.flex_positions = ['RB', 'WR', 'TE']
@@ -15,11 +18,37 @@ class FantasyFootballDraftAssistant:
         self.total_episodes = 0
         self.num_teams = 12
         
+    @property
+    def df(self):
+        # Built on demand so a snapshot-loaded assistant never has to import pandas
+        if self._df is None and self.players:
+            import pandas as pd
+            self._df = pd.DataFrame(self.players)
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        self._df = value
+
+    @property
+    def name_index(self):
+        if self._name_index is None:
+            from player_names import PlayerNameIndex
+            self._name_index = PlayerNameIndex(self.players)
+        return self._name_index
+
+    def find_player(self, name):
+        player = self.name_index.info.get(self.name_index.resolve(name, fuzzy=False))
+        if player is None:
+            raise KeyError(f"Unknown player '{name}'")
+        return player
+
     def load_data(self, file_path):
-        self.df = pd.read_csv(file_path)
-        self.df['ADP'] = pd.to_numeric(self.df['ADP'], errors='coerce')
-        self.df = self.df.sort_values('ADP').reset_index(drop=True)
+        from data_cache import load_table
+        df = load_table(file_path, numeric_columns=['ADP'])
+        self.df = df.sort_values('ADP').reset_index(drop=True)
         self.players = self.df.to_dict('records')
+        self._name_index = None
         
     def get_state(self, team, round_num, pick_number):
         pos_counts = {pos: sum(1 for p in team if p['pos'] == pos) for pos in self.positions.keys()}
@@ -77,4 +106,73 @@ class FantasyFootballDraftAssistant:
         logging.debug(f"Q-table size after loading: {len(self.q_table)}")
         logging.debug(f"Sample Q-table entries: {list(self.q_table.items())[:5]}")
 
-# The simulate_draft function has been removed as it's not used
\ No newline at end of file
+    def save_snapshot(self, file_path, sources=None):
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'sources': sources or {},
+            'players': self.players,
+            'q_table': self.q_table,
+            'total_episodes': self.total_episodes,
+        }
+        with atomic_write(file_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logging.info(f"Draft snapshot saved to {file_path}")
+
+    def load_snapshot(self, file_path, sources=None):
+        with open(file_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported draft snapshot version in {file_path}")
+        if sources is not None and snapshot.get('sources') != sources:
+            raise ValueError(f"Draft snapshot {file_path} is stale")
+        self._df = None
+        self._name_index = None
+        self.players = snapshot['players']
+        self.q_table = snapshot['q_table']
+        self.total_episodes = snapshot['total_episodes']
+        logging.info(f"Draft snapshot loaded from {file_path}. Q-table size: {len(self.q_table)}")
+
+
+def source_signature(*paths):
+    # (size, mtime) per existing artifact; cheap enough to check on every start
+    signature = {}
+    for path in paths:
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+    return signature
+
+
+def build_draft_assistant(data_path, model_path, snapshot_path=None):
+    assistant = FantasyFootballDraftAssistant()
+    sources = source_signature(data_path, model_path)
+
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            assistant.load_snapshot(snapshot_path, sources=sources)
+            return assistant
+        except Exception as e:
+            logging.warning(f"Ignoring draft snapshot {snapshot_path}: {str(e)}")
+
+    assistant.load_data(data_path)
+    if os.path.exists(model_path):
+        assistant.load_model(model_path)
+        logging.info("Loaded existing model.")
+    else:
+        logging.error("Pre-trained model not found. Please ensure the model file exists.")
+
+    if snapshot_path:
+        try:
+            assistant.save_snapshot(snapshot_path, sources=sources)
+        except OSError as e:
+            logging.warning(f"Could not write draft snapshot {snapshot_path}: {str(e)}")
+    return assistant
+
+# The simulate_draft function has been removed as it's not used
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Prebuild the snapshot at image build time: python -m models.draft_recommendation
+    build_draft_assistant('data/cbs_fantasy_projection_master.csv',
+                          'models/fantasy_football_model.pkl',
+                          'data/draft_snapshot.pkl')
\ No newline at end of file
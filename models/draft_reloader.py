@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from file_utils import file_digest
+from models.draft_recommendation import build_draft_assistant, source_signature
+
+# A published snapshot is never mutated; requests keep whichever one they grabbed first
+DraftSnapshot = namedtuple('DraftSnapshot', ['version', 'assistant'])
+
+
+class DraftAssistantReloader:
+    def __init__(self, data_path, model_path, snapshot_path=None, poll_interval=30):
+        self.data_path = data_path
+        self.model_path = model_path
+        self.snapshot_path = snapshot_path
+        self.poll_interval = poll_interval
+
+        self._signature = source_signature(data_path, model_path)
+        self._digests = self._compute_digests()
+        self._snapshot = DraftSnapshot(self._version(self._digests),
+                                       build_draft_assistant(data_path, model_path, snapshot_path))
+        self._rebuild_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def current(self):
+        return self._snapshot.assistant
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def _compute_digests(self):
+        return {path: file_digest(path) for path in (self.data_path, self.model_path) if os.path.exists(path)}
+
+    @staticmethod
+    def _version(digests):
+        combined = hashlib.sha1('|'.join(f"{path}:{digest}" for path, digest in sorted(digests.items())).encode())
+        return combined.hexdigest()[:12]
+
+    def check(self):
+        # mtime/size is the cheap trigger; the content hash decides whether a rebuild is needed
+        signature = source_signature(self.data_path, self.model_path)
+        if signature == self._signature:
+            return False
+        digests = self._compute_digests()
+        if digests == self._digests:
+            self._signature = signature
+            return False
+        # If a rebuild is already running, leave the signature alone so the next poll retries
+        if self.reload_async(digests) is None:
+            return False
+        self._signature = signature
+        return True
+
+    def reload_async(self, digests=None):
+        if not self._rebuild_lock.acquire(blocking=False):
+            logging.info("Draft assistant rebuild already in progress")
+            return None
+        thread = threading.Thread(target=self._rebuild, args=(digests,), name='draft-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def _rebuild(self, digests=None):
+        try:
+            digests = digests or self._compute_digests()
+            version = self._version(digests)
+            logging.info(f"Rebuilding draft assistant snapshot {version}")
+            assistant = build_draft_assistant(self.data_path, self.model_path, self.snapshot_path)
+            # Single attribute assignment: readers see either the old or the new snapshot, never a mix
+            self._snapshot = DraftSnapshot(version, assistant)
+            self._digests = digests
+            logging.info(f"Draft assistant snapshot {version} is live")
+        except Exception as e:
+            logging.exception(f"Draft assistant reload failed, keeping {self.version}: {str(e)}")
+        finally:
+            self._rebuild_lock.release()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Error checking draft artifacts: {str(e)}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='draft-watch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,181 @@
+import logging
+import re
+import threading
+from typing import List, Optional, TypedDict
+
+from player_names import get_player_index, name_tokens
+
+logger = logging.getLogger(__name__)
+
+TEAM_NAMES = {
+    'ARI': 'arizona cardinals', 'ATL': 'atlanta falcons', 'BAL': 'baltimore ravens', 'BUF': 'buffalo bills',
+    'CAR': 'carolina panthers', 'CHI': 'chicago bears', 'CIN': 'cincinnati bengals', 'CLE': 'cleveland browns',
+    'DAL': 'dallas cowboys', 'DEN': 'denver broncos', 'DET': 'detroit lions', 'GB': 'green bay packers',
+    'HOU': 'houston texans', 'IND': 'indianapolis colts', 'JAC': 'jacksonville jaguars', 'KC': 'kansas city chiefs',
+    'LAC': 'los angeles chargers', 'LAR': 'los angeles rams', 'LV': 'las vegas raiders', 'MIA': 'miami dolphins',
+    'MIN': 'minnesota vikings', 'NE': 'new england patriots', 'NO': 'new orleans saints', 'NYG': 'new york giants',
+    'NYJ': 'new york jets', 'PHI': 'philadelphia eagles', 'PIT': 'pittsburgh steelers', 'SEA': 'seattle seahawks',
+    'SF': 'san francisco 49ers', 'TB': 'tampa bay buccaneers', 'TEN': 'tennessee titans', 'WAS': 'washington commanders',
+}
+# Abbreviations that are also everyday words are only matched through the full team name; the rest only
+# when typed in capitals ("KC", not "kc")
+AMBIGUOUS_TEAM_CODES = {'NO', 'NE', 'MIN', 'CAR', 'DEN', 'IND', 'DET', 'SEA', 'PIT', 'ARI', 'BAL', 'CHI', 'MIA', 'DAL',
+                        'WAS', 'TEN'}
+
+# Surnames that double as common words never count as a player mention on their own
+COMMON_WORDS = {
+    'love', 'hurts', 'hill', 'brown', 'white', 'young', 'price', 'best', 'smith', 'johnson', 'jones',
+    'williams', 'davis', 'allen', 'moore', 'miller', 'wilson', 'taylor', 'thomas', 'jackson', 'harris', 'lewis',
+    'mills', 'walker', 'cook', 'hall', 'wright', 'green', 'king', 'chase', 'rice', 'london', 'hunt',
+    'waller', 'carter', 'bell', 'page', 'gates', 'worthy', 'pacheco', 'mack', 'hardy', 'pierce', 'stone',
+}
+
+POSITION_CODES = {
+    'qb': 'QB', 'qbs': 'QB', 'quarterback': 'QB', 'quarterbacks': 'QB', 'rb': 'RB', 'rbs': 'RB', 'running': 'RB',
+    'wr': 'WR', 'wrs': 'WR', 'receiver': 'WR', 'receivers': 'WR', 'te': 'TE', 'tes': 'TE', 'tight': 'TE',
+    'kicker': 'K', 'kickers': 'K', 'defense': 'DST', 'dst': 'DST', 'flex': 'FLEX',
+}
+POSITION_TERMS = set(POSITION_CODES)
+PLAYER_TERMS = {
+    'sleeper', 'sleepers', 'bust', 'busts', 'breakout', 'breakouts', 'rookie', 'rookies', 'injury', 'injured',
+    'injuries', 'outlook', 'projection', 'projections', 'stats', 'adp', 'rank', 'ranking', 'rankings', 'draft',
+    'start', 'sit', 'trade', 'handcuff', 'handcuffs', 'value', 'target', 'targets', 'who', 'player', 'players',
+}
+# Words that can surround a bare name lookup ("what about J K Dobbins?", "Ja'Marr Chase outlook")
+NAME_LOOKUP_FILLER = {
+    'what', 'whats', 'about', 'how', 'is', 's', 'the', 'a', 'of', 'on', 'for', 'and', 'or', 'vs', 'versus',
+    'outlook', 'news', 'update', 'thoughts', 'fantasy', 'info', 'tell', 'me',
+}
+STRATEGY_TERMS = {
+    'strategy', 'strategies', 'zero', 'hero', 'robust', 'vbd', 'scoring', 'settings', 'league', 'format',
+    'snake', 'auction', 'keeper', 'dynasty', 'waiver', 'waivers', 'faab', 'bestball', 'tiers', 'approach',
+}
+
+
+class PlayerIntent(TypedDict):
+    needs_player_info: Optional[bool]  # None means the rules could not decide
+    player_ids: List[str]
+    player_names: List[str]
+    teams: List[str]
+    positions: List[str]  # position codes the question mentions ("late-round QBs" -> QB)
+    name_only: bool  # nothing but names, teams and filler: a keyword lookup answers it without embeddings
+    unresolved_names: List[str]  # capitalized name words that matched no single player ("Chase", "Lamar")
+
+
+class PlayerIntentClassifier:
+    def __init__(self, name_index=None):
+        self.name_index = name_index or get_player_index()
+        # Token trie over every alias; terminal nodes hold ('player', id) or ('team', code)
+        self._trie = {}
+        self._name_words = set()
+        surname_owners = {}
+        for player_id, info in self.name_index.info.items():
+            if str(info.get('pos')) == 'DST':
+                continue
+            tokens = name_tokens(info['player'])
+            self._add(tokens, ('player', player_id))
+            self._name_words.update(token for token in tokens if len(token) >= 3)
+            # "D.J. Moore" is typed "d j moore" as often as "dj moore"
+            if tokens and len(tokens[0]) <= 3 and tokens[0].isalpha() and len(tokens) > 1:
+                self._add(list(tokens[0]) + tokens[1:], ('player', player_id))
+            if len(tokens) > 1:
+                surname_owners.setdefault(tokens[-1], set()).add(player_id)
+        for surname, owners in surname_owners.items():
+            if len(owners) == 1 and len(surname) >= 4 and surname not in COMMON_WORDS:
+                self._add([surname], ('player', next(iter(owners))))
+        for code, full_name in TEAM_NAMES.items():
+            words = full_name.split()
+            self._name_words.difference_update(words)
+            self._add(words, ('team', code))
+            self._add(words[-1:], ('team', code))
+            if code not in AMBIGUOUS_TEAM_CODES:
+                # Codes stay upper case in the token stream (see tokenize), so "was" or "ten" never match
+                self._add([code], ('team', code))
+
+    def _add(self, tokens, value):
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(None, value)
+
+    def match(self, tokens):
+        # Longest match from each position, skipping past whatever was matched; yields (start, end, value)
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node, j, found = self._trie, i, None
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if None in node:
+                    found = (j, node[None])
+            if found:
+                matches.append((i, found[0], found[1]))
+                i = found[0]
+            else:
+                i += 1
+        return matches
+
+    @staticmethod
+    def tokenize(question):
+        # Lower case, except team codes typed in capitals
+        tokens = [t for t in re.split(r'[^A-Za-z0-9]+', re.sub(r"['`]", '', question)) if t]
+        return [t if t.isupper() and t in TEAM_NAMES else t.lower() for t in tokens]
+
+    @staticmethod
+    def capitalized_words(question):
+        # Capitalized words that don't start a sentence: "How does Jefferson compare to Chase" -> jefferson, chase
+        words, sentence_start = [], True
+        for word in re.findall(r"[A-Za-z0-9'`]+|[.?!]", question):
+            if word in '.?!':
+                sentence_start = True
+                continue
+            if not sentence_start and word[0].isupper() and not word.isupper():
+                words.append(re.sub(r"['`]", '', word).lower())
+            sentence_start = False
+        return words
+
+    def classify(self, question: str) -> PlayerIntent:
+        tokens = self.tokenize(question)
+        matches = self.match(tokens)
+        player_ids = list(dict.fromkeys(value for _, _, (kind, value) in matches if kind == 'player'))
+        teams = list(dict.fromkeys(value for _, _, (kind, value) in matches if kind == 'team'))
+        words = set(tokens)
+        matched = {position for start, end, _ in matches for position in range(start, end)}
+        unmatched = {token for position, token in enumerate(tokens) if position not in matched}
+        # A name we can't pin to one player ("Chase" is also a common word, "Allen" has several owners)
+        # means the matched players are not the whole question
+        unresolved_names = list(dict.fromkeys(word for word in self.capitalized_words(question)
+                                              if word in unmatched and word in self._name_words))
+
+        if player_ids or teams or unresolved_names:
+            needs_player_info = True
+        elif words & STRATEGY_TERMS and not words & PLAYER_TERMS:
+            needs_player_info = False
+        elif words & POSITION_TERMS and words & PLAYER_TERMS:
+            needs_player_info = True
+        else:
+            needs_player_info = None
+
+        return PlayerIntent(
+            needs_player_info=needs_player_info,
+            player_ids=player_ids,
+            player_names=[self.name_index.canonical_name(player_id) for player_id in player_ids],
+            teams=teams,
+            positions=sorted({POSITION_CODES[token] for token in words & POSITION_TERMS}),
+            name_only=bool(matches) and unmatched <= NAME_LOOKUP_FILLER,
+            unresolved_names=unresolved_names,
+        )
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier():
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = PlayerIntentClassifier()
+    return _classifier
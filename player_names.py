@@ -0,0 +1,204 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYER_FILE = 'data/cbs_fantasy_projection_master.csv'
+ALIAS_CACHE_PATH = os.path.join('data', '.cache', 'player_aliases.json')
+SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+FUZZY_THRESHOLD = 0.55
+# Fuzzy hits from untrusted input (chat questions, API parameters) are remembered in a bounded LRU only
+RECENT_ALIAS_LIMIT = 4096
+
+
+def name_tokens(name):
+    # "D.J. Moore", "DJ Moore" and "D J Moore" all become ['dj', 'moore']; "A.Abdullah" becomes ['a', 'abdullah']
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode().lower()
+    name = re.sub(r"['`]", '', name)
+    tokens = [t for t in re.split(r'[^a-z0-9]+', name) if t and t not in SUFFIXES]
+    initials = 0
+    while initials < len(tokens) and len(tokens[initials]) == 1:
+        initials += 1
+    if initials >= 2:
+        tokens = [''.join(tokens[:initials])] + tokens[initials:]
+    return tokens
+
+
+def normalize_name(name):
+    return ' '.join(name_tokens(name))
+
+
+def initial_key(name):
+    # Stats feeds abbreviate first names ("A.Abdullah"); match them on first initial + surname
+    tokens = name_tokens(name)
+    if len(tokens) < 2:
+        return None
+    return f"{tokens[0][0]} {' '.join(tokens[1:])}"
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlayerNameIndex:
+    def __init__(self, players, alias_path=None):
+        # players: iterable of dicts with at least 'player', optionally 'pos' and 'team'
+        self.alias_path = alias_path
+        self.names = {}
+        self.info = {}
+        self._by_key = {}
+        self._by_initial = defaultdict(set)
+        self._by_trigram = defaultdict(set)
+        # Persisted aliases come from trusted ingest only; request-time hits go to the bounded _recent map
+        self._aliases = {}
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+        collisions = defaultdict(list)
+        for player in players:
+            collisions[normalize_name(player['player'])].append(player)
+
+        for key, group in collisions.items():
+            for player in group:
+                player_id = key.replace(' ', '-')
+                if len(group) > 1 and player.get('pos'):
+                    player_id = f"{player_id}-{str(player['pos']).lower()}"
+                self.names.setdefault(player_id, player['player'])
+                self.info.setdefault(player_id, player)
+                # Same-name entries (Taysom Hill at QB and TE) get position-suffixed ids;
+                # the bare name resolves to the first listed, like the old first-match scans
+                self._by_key.setdefault(key, player_id)
+                short = initial_key(player['player'])
+                if short:
+                    self._by_initial[short].add(player_id)
+                for gram in _trigrams(key):
+                    self._by_trigram[gram].add(player_id)
+
+        self._fingerprint = hashlib.sha1('|'.join(sorted(self.names)).encode()).hexdigest()[:12]
+        self._load_aliases()
+
+    @classmethod
+    def from_csv(cls, file_path=MASTER_PLAYER_FILE, alias_path=ALIAS_CACHE_PATH):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            players = list(csv.DictReader(f))
+        return cls(players, alias_path=alias_path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _load_aliases(self):
+        if not self.alias_path or not os.path.exists(self.alias_path):
+            return
+        try:
+            with open(self.alias_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring player alias cache {self.alias_path}: {str(e)}")
+            return
+        # Aliases are only valid for the player set they were resolved against
+        if cached.get('fingerprint') == self._fingerprint:
+            # Older caches also stored misses as null
+            self._aliases = {key: player_id for key, player_id in cached.get('aliases', {}).items() if player_id}
+
+    def save_aliases(self):
+        if not self.alias_path:
+            return
+        with self._lock:
+            payload = {'fingerprint': self._fingerprint, 'aliases': dict(self._aliases)}
+        os.makedirs(os.path.dirname(self.alias_path), exist_ok=True)
+        with atomic_write(self.alias_path, 'w') as f:
+            json.dump(payload, f)
+
+    def _fuzzy(self, key):
+        grams = _trigrams(key)
+        scores = defaultdict(int)
+        for gram in grams:
+            for player_id in self._by_trigram.get(gram, ()):
+                scores[player_id] += 1
+        best_id, best_score = None, 0.0
+        for player_id, shared in scores.items():
+            other = normalize_name(self.names[player_id])
+            score = shared / len(grams | _trigrams(other))
+            if score > best_score:
+                best_id, best_score = player_id, score
+        return best_id if best_score >= FUZZY_THRESHOLD else None
+
+    def _remember(self, key, player_id, learn):
+        with self._lock:
+            if learn:
+                self._aliases[key] = player_id
+                return
+            self._recent[key] = player_id
+            self._recent.move_to_end(key)
+            if len(self._recent) > RECENT_ALIAS_LIMIT:
+                self._recent.popitem(last=False)
+
+    def _recent_alias(self, key):
+        with self._lock:
+            player_id = self._recent.get(key)
+            if player_id is not None:
+                self._recent.move_to_end(key)
+            return player_id
+
+    def resolve(self, name, fuzzy=True, learn=False):
+        # learn=True is for ingest from the project's own data files: a fuzzy hit is added to the aliases
+        # that save_aliases persists. Misses are never memoized.
+        if name is None:
+            return None
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._by_key:
+            return self._by_key[key]
+        if key in self._aliases:
+            return self._aliases[key]
+        recent = self._recent_alias(key)
+        if recent is not None:
+            return recent
+        if not fuzzy:
+            return None
+
+        short = initial_key(name)
+        candidates = self._by_initial.get(short, set()) if short else set()
+        if len(candidates) == 1:
+            player_id = next(iter(candidates))
+        elif len(name_tokens(name)[0]) == 1:
+            # Abbreviated names are too short to fuzzy match safely
+            player_id = None
+        else:
+            player_id = self._fuzzy(key)
+        if player_id is not None:
+            self._remember(key, player_id, learn)
+        return player_id
+
+    def canonical_name(self, player_id):
+        return self.names.get(player_id)
+
+    def attach_ids(self, df, column='player', id_column='player_id'):
+        # Resolve each distinct spelling once, then map the whole column
+        mapping = {name: self.resolve(name, learn=True) for name in df[column].dropna().unique()}
+        df[id_column] = df[column].map(mapping)
+        return df
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_player_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PlayerNameIndex.from_csv()
+    return _index
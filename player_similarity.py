@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from file_utils import atomic_write
+from player_names import get_player_index
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_PATH = os.path.join('data', '.cache', 'player_similarity.json')
+TOP_N = 6
+
+
+def fetch_player_rows(engine, table_name):
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        return list(conn.execute(text(f"SELECT document, meta, embedding FROM `{table_name}`")))
+
+
+def build_similarity_table(rows, top_n=TOP_N, name_index=None):
+    # rows: (outlook, metadata, stored embedding). Players are only compared within their position,
+    # which is what the similar players view shows; each position is one matrix product.
+    from vector_index import unit_vector
+
+    name_index = name_index or get_player_index()
+    players = {}
+    vectors = {}
+    for document, meta, embedding in rows:
+        metadata = json.loads(meta) if isinstance(meta, (str, bytes)) else (meta or {})
+        name = metadata.get('player')
+        if not name:
+            continue
+        player_id = name_index.resolve(name) or name
+        if player_id in players:
+            continue
+        players[player_id] = {
+            'player': name,
+            'position': metadata.get('pos'),
+            'ppr_projection': metadata.get('ppr_projection'),
+            'outlook': document,
+        }
+        vectors[player_id] = unit_vector(embedding)
+
+    by_position = defaultdict(list)
+    for player_id, player in players.items():
+        by_position[player['position']].append(player_id)
+
+    similar = {}
+    for position, player_ids in by_position.items():
+        matrix = np.stack([vectors[player_id] for player_id in player_ids])
+        scores = matrix @ matrix.T
+        np.fill_diagonal(scores, -np.inf)
+        n = min(top_n, len(player_ids) - 1)
+        for i, player_id in enumerate(player_ids):
+            if n <= 0:
+                similar[player_id] = []
+                continue
+            top = np.argpartition(-scores[i], n - 1)[:n]
+            top = top[np.argsort(-scores[i][top])]
+            similar[player_id] = [[player_ids[j], round(float(scores[i][j]), 6)] for j in top]
+
+    return {'top_n': top_n, 'players': players, 'similar': similar}
+
+
+def save_similarity_table(table, path=SIMILARITY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_write(path, 'w') as f:
+        json.dump(table, f)
+
+
+def rebuild_similarity_table(engine, table_name, path=SIMILARITY_PATH, top_n=TOP_N):
+    table = build_similarity_table(fetch_player_rows(engine, table_name), top_n=top_n)
+    save_similarity_table(table, path)
+    logger.info(f"Built player similarity table for {len(table['players'])} players at {path}")
+    return table
+
+
+class PlayerSimilarityIndex:
+    # Serves the precomputed table; reloads it when the ingestion job rewrites the file
+    def __init__(self, path=SIMILARITY_PATH):
+        self.path = path
+        self._table = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(self.path) as f:
+                        self._table = json.load(f)
+                    self._mtime = mtime
+        return self._table
+
+    @property
+    def available(self):
+        return self._current() is not None
+
+    def similar(self, player_id, limit=TOP_N):
+        # None means the player is not in the table, [] that it has no same-position peers
+        table = self._current()
+        if table is None or player_id not in table['similar']:
+            return None
+        return [dict(table['players'][other_id], similarity_score=score)
+                for other_id, score in table['similar'][player_id][:limit]]
+
+
+_similarity_index = None
+_similarity_lock = threading.Lock()
+
+
+def get_similarity_index():
+    global _similarity_index
+    if _similarity_index is None:
+        with _similarity_lock:
+            if _similarity_index is None:
+                _similarity_index = PlayerSimilarityIndex()
+    return _similarity_index
+
+
+if __name__ == "__main__":
+    import yaml
+    from clients import get_clients, store_engine
+
+    logging.basicConfig(level=logging.INFO)
+    with open('static/config.yml', 'r') as file:
+        config = yaml.safe_load(file)
+    table_name = config['vectordb']['playerreport']
+    rebuild_similarity_table(store_engine(get_clients().tidb_vector_store(table_name)), table_name)
@@ -0,0 +1,72 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# API errors (Google, DuckDuckGo) are matched by name so callers don't need those packages imported
+RETRYABLE_ERRORS = {'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded',
+                    'InternalServerError', 'ServerError', 'RateLimitError', 'RatelimitException', 'TimeoutException'}
+
+
+class TokenBucket:
+    # Refills continuously at `rate_per_minute`; up to `burst` tokens can be spent at once after an idle spell.
+    # Thread-safe: every worker shares one bucket, so the pool as a whole stays under the quota.
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, rate_per_minute / 60.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+            self.waited += delay
+            time.sleep(delay)
+
+    def penalize(self, seconds):
+        # After a 429 the server's window is still full; drain the bucket so every worker backs off, not just one
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    message = str(error).lower()
+    return '429' in message or '503' in message or 'quota' in message or 'ratelimit' in message
+
+
+def call_with_retry(func, *args, max_retries=5, base_delay=2.0, max_delay=60.0, bucket=None, **kwargs):
+    # Exponential backoff with full jitter, so workers that failed together don't retry together
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            logger.warning(f"Retrying after {type(e).__name__} in {delay:.1f}s (attempt {attempt}/{max_retries}): {str(e)}")
+            if bucket is not None:
+                bucket.penalize(delay)
+            time.sleep(delay)
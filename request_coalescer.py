@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question):
+    return ' '.join(str(question).lower().split())
+
+
+class _Flight:
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+
+class StreamCoalescer:
+    # Single-flight for streamed answers: the first request for a key starts the producer on a background
+    # thread, and every request for the same key while it runs replays what was produced so far and then
+    # follows it live. The producer runs to completion even if the request that started it disconnects.
+    def __init__(self, wait_timeout=120):
+        self.wait_timeout = wait_timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    def stream(self, key, producer):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.started += 1
+                threading.Thread(target=self._run, args=(key, flight, producer), daemon=True).start()
+            else:
+                self.coalesced += 1
+                logger.info(f"Joining in-flight request: {key}")
+        return self._follow(flight)
+
+    def _run(self, key, flight, producer):
+        try:
+            for item in producer():
+                with flight.condition:
+                    flight.items.append(item)
+                    flight.condition.notify_all()
+        except Exception as e:
+            logger.error(f"Coalesced request failed for {key}: {str(e)}")
+            with self._lock:
+                self.failed += 1
+            flight.error = e
+        finally:
+            # Later requests start a fresh computation (or hit the answer cache) instead of replaying this one
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def _follow(self, flight):
+        position = 0
+        while True:
+            with flight.condition:
+                ready = flight.condition.wait_for(lambda: position < len(flight.items) or flight.done,
+                                                  timeout=self.wait_timeout)
+                if not ready:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise TimeoutError(f"No response within {self.wait_timeout}s")
+                items = flight.items[position:]
+                done = flight.done
+            position += len(items)
+            yield from items
+            if done:
+                # Every subscriber sees the failure, not just the one that started the flight
+                if flight.error is not None:
+                    raise RuntimeError(f"Answer generation failed: {flight.error}") from flight.error
+                return
+
+    def stats(self):
+        # Counters change under the same lock as the flight map, so a snapshot is consistent
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'started': self.started,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+            }
+
+
+class _AsyncFlight:
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Condition()
+        self.task = None
+
+
+class AsyncStreamCoalescer(StreamCoalescer):
+    # The same single-flight behaviour for the ASGI server: the producer is an async iterator run as a task
+    # on the event loop, and followers await new tokens instead of holding a thread while they wait.
+    def stream(self, key, producer):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _AsyncFlight()
+            self.started += 1
+            flight.task = asyncio.ensure_future(self._run(key, flight, producer))
+        else:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight request: {key}")
+        return self._follow(flight)
+
+    async def _run(self, key, flight, producer):
+        try:
+            async for item in producer():
+                async with flight.changed:
+                    flight.items.append(item)
+                    flight.changed.notify_all()
+        except Exception as e:
+            logger.error(f"Coalesced request failed for {key}: {str(e)}")
+            self.failed += 1
+            flight.error = e
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    async def _follow(self, flight):
+        position = 0
+        while True:
+            async with flight.changed:
+                try:
+                    await asyncio.wait_for(
+                        flight.changed.wait_for(lambda: position < len(flight.items) or flight.done),
+                        timeout=self.wait_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise TimeoutError(f"No response within {self.wait_timeout}s")
+                items = flight.items[position:]
+                done = flight.done
+            position += len(items)
+            for item in items:
+                yield item
+            if done:
+                if flight.error is not None:
+                    raise RuntimeError(f"Answer generation failed: {flight.error}") from flight.error
+                return
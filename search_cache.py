@@ -0,0 +1,114 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join('data', '.cache', 'web_search.sqlite')
+
+# News goes stale within the hour; biographical facts hold for the season
+NEWS_TERMS = re.compile(r'\b(news|latest|today|tonight|this week|injur\w*|status|update\w*|report\w*|trade\w*|'
+                        r'sign\w*|released|waived|depth chart|practice|questionable|doubtful|ruled out)\b')
+BIO_TERMS = re.compile(r'\b(college|born|age|height|weight|drafted|draft pick|career|biography|hometown|contract)\b')
+
+
+def normalize_query(query):
+    return ' '.join(str(query).lower().split())
+
+
+class CachedSearch:
+    # Wraps any search tool with run(query) -> str. Results persist in sqlite so the app and the bots share
+    # them. Past its TTL an entry is still served for up to another TTL while one background refresh runs
+    # (stale-while-revalidate); after that the caller waits for a fresh search.
+    def __init__(self, search, cache_path=DEFAULT_CACHE_PATH, news_ttl=1800, default_ttl=21600,
+                 bio_ttl=604800, stale_factor=1.0):
+        self.search = search
+        self.news_ttl = news_ttl
+        self.default_ttl = default_ttl
+        self.bio_ttl = bio_ttl
+        self.stale_factor = stale_factor
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = {'fresh': 0, 'stale': 0}
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+        # WAL lets the app read while a bot process writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS searches "
+            "(query TEXT PRIMARY KEY, result TEXT, fetched_at REAL, duration REAL)"
+        )
+        self._db.commit()
+
+    def ttl(self, query):
+        if NEWS_TERMS.search(query):
+            return self.news_ttl
+        if BIO_TERMS.search(query):
+            return self.bio_ttl
+        return self.default_ttl
+
+    def _fetch(self, key, query):
+        start = time.perf_counter()
+        result = self.search.run(query)
+        duration = time.perf_counter() - start
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                             (key, result, time.time(), duration))
+            self._db.commit()
+        return result
+
+    def _refresh(self, key, query):
+        try:
+            self._fetch(key, query)
+        except Exception as e:
+            logger.warning(f"Background search refresh failed for '{query}': {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def run(self, query, *args, **kwargs):
+        key = normalize_query(query)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result, fetched_at, duration FROM searches WHERE query = ?", (key,)
+            ).fetchone()
+        if row is not None:
+            result, fetched_at, duration = row
+            age = time.time() - fetched_at
+            ttl = self.ttl(key)
+            if age < ttl:
+                with self._lock:
+                    self.hits['fresh'] += 1
+                    self.seconds_saved += duration
+                return result
+            if age < ttl * (1 + self.stale_factor):
+                with self._lock:
+                    self.hits['stale'] += 1
+                    self.seconds_saved += duration
+                    refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if refresh:
+                    threading.Thread(target=self._refresh, args=(key, query), daemon=True).start()
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return self._fetch(key, query)
+
+    def stats(self):
+        with self._lock:
+            fresh, stale, misses, seconds_saved = self.hits['fresh'], self.hits['stale'], self.misses, self.seconds_saved
+        total = fresh + stale + misses
+        return {
+            'fresh_hits': fresh,
+            'stale_hits': stale,
+            'misses': misses,
+            'hit_rate': round((fresh + stale) / total, 4) if total else 0.0,
+            'seconds_saved': round(seconds_saved, 2),
+        }
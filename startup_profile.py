@@ -0,0 +1,61 @@
+import logging
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_process_start = time.perf_counter()
+_phases = []
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - start))
+
+
+def report():
+    total = time.perf_counter() - _process_start
+    lines = [f"Startup profile ({total * 1000:.0f} ms since startup_profile import):"]
+    for name, seconds in _phases:
+        lines.append(f"  {name:<24} {seconds * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+def import_profile(module='app', top=15):
+    # Runs `python -X importtime` in a fresh interpreter so nothing is already cached in sys.modules
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        _, cumulative_us, name = fields
+        # Depth-1 entries are what `module` imports directly; each accounts for its whole subtree once
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth != 1:
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(cumulative_us.strip()) / 1e6
+    ranked = sorted(packages.items(), key=lambda x: x[1], reverse=True)[:top]
+    lines = [f"Import profile for '{module}' (cumulative per direct import, top {top}):"]
+    for name, seconds in ranked:
+        lines.append(f"  {name:<40} {seconds * 1000:8.1f} ms")
+    if result.returncode != 0:
+        lines.append(f"  import failed: {result.stderr.strip().splitlines()[-1]}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else 'app'
+    print(import_profile(module))
@@ -87,6 +87,7 @@ function fetchChatbotResponse(message) {
         const decoder = new TextDecoder();
         let fullResponse = '';
         let errorOccurred = false;
+        let pending = '';
 
         function read() {
             return reader.read().then(({ done, value }) => {
@@ -99,14 +100,19 @@ function fetchChatbotResponse(message) {
                     return;
                 }
 
-                const chunk = decoder.decode(value);
-                const lines = chunk.split('\n');
+                // Events can be split across reads; keep the trailing partial line for the next one
+                pending += decoder.decode(value, { stream: true });
+                const lines = pending.split('\n');
+                pending = lines.pop();
 
                 lines.forEach(line => {
                     if (line.startsWith('data: ')) {
                         try {
                             const data = JSON.parse(line.slice(6));
-                            if (data.chunk) {
+                            if (data.token !== undefined) {
+                                fullResponse += data.token;
+                                textElement.innerHTML = marked.parse(fullResponse);
+                            } else if (data.chunk) {
                                 fullResponse += data.chunk + '\n';
                                 textElement.innerHTML = marked.parse(fullResponse);
                             } else if (data.references) {
@@ -205,6 +211,7 @@ function fetchYoutubeExpertResponse(message, channels) {
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
         let fullResponse = '';
+        let pending = '';
 
         function read() {
             return reader.read().then(({ done, value }) => {
@@ -212,14 +219,19 @@ function fetchYoutubeExpertResponse(message, channels) {
                     return;
                 }
 
-                const chunk = decoder.decode(value);
-                const lines = chunk.split('\n');
+                // Events can be split across reads; keep the trailing partial line for the next one
+                pending += decoder.decode(value, { stream: true });
+                const lines = pending.split('\n');
+                pending = lines.pop();
 
                 lines.forEach(line => {
                     if (line.startsWith('data: ')) {
                         try {
                             const data = JSON.parse(line.slice(6));
-                            if (data.chunk) {
+                            if (data.token !== undefined) {
+                                fullResponse += data.token;
+                                textElement.innerHTML = marked.parse(fullResponse);
+                            } else if (data.chunk) {
                                 fullResponse += data.chunk + '\n';
                                 textElement.innerHTML = marked.parse(fullResponse);
                             } else if (data.references) {
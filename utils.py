@@ -1,29 +1,17 @@
-from flask import Flask, render_template, request, jsonify, Response
-from models.draft_recommendation import FantasyFootballDraftAssistant
 import logging
-import os
-import numpy as np
-from dotenv import load_dotenv
-from langchain_community.vectorstores import TiDBVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
 import json
-import yaml
-from NFLFantasyQA import NFLFantasyQA
+from clients import get_clients, store_engine
+
+# langchain imports live inside the factories below so importing split_response stays cheap
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 
 
 # Create retriever and chatbot chain
 def create_retriever(embeddings,tidb_connection_string, ARTICLE_TABLE_NAME,search_kwargs=None):
-    #embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
-    vector_store = TiDBVectorStore.from_existing_vector_table(
-        embedding=embeddings,
-        connection_string=tidb_connection_string,
-        table_name=ARTICLE_TABLE_NAME
-    )
+    # Retrievers are cheap views over the pooled store; the store and its engine are shared
+    vector_store = get_clients().vector_store(ARTICLE_TABLE_NAME, embedding=embeddings,
+                                              connection_string=tidb_connection_string)
     if search_kwargs is None:
         search_kwargs = {"k": 5}
     return vector_store.as_retriever(search_kwargs=search_kwargs)
@@ -31,12 +19,10 @@ def create_retriever(embeddings,tidb_connection_string, ARTICLE_TABLE_NAME,searc
 
 
 def create_chatbot(retriever,google_api_key):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash-001",
-        temperature=0.3,
-        top_p=0.95,
-        google_api_key=google_api_key
-    )
+    from langchain.prompts import PromptTemplate
+    from langchain.schema.runnable import RunnablePassthrough
+
+    llm = get_clients().chat_model(temperature=0.3, top_p=0.95)
 
     prompt_template = """You are an NFL Fantasy Football expert.
     You are provided with the content from famous fantasy football channels on YouTube.
@@ -73,22 +59,46 @@ def create_chatbot(retriever,google_api_key):
 
 
 def create_youtube_retriever(embeddings,tidb_connection_string,YOUTUBE_TABLE_NAME,search_kwargs=None, channels=None):
-    # embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
-    vector_store = TiDBVectorStore.from_existing_vector_table(
-        embedding=embeddings,
-        connection_string=tidb_connection_string,
-        table_name=YOUTUBE_TABLE_NAME
-    )
+    vector_store = get_clients().vector_store(YOUTUBE_TABLE_NAME, embedding=embeddings,
+                                              connection_string=tidb_connection_string)
     if search_kwargs is None:
         search_kwargs = {"k": 5}
     
     if channels:
-        filter_func = lambda doc: any(channel in doc.metadata['channel_name'] for channel in channels)
-        return vector_store.as_retriever(search_kwargs=search_kwargs, filter=filter_func)
+        from langchain_core.runnables import RunnableLambda
+        k = search_kwargs.get("k", 5)
+        return RunnableLambda(lambda question: channel_search(vector_store, YOUTUBE_TABLE_NAME, question, channels, k))
     else:
         return vector_store.as_retriever(search_kwargs=search_kwargs)
 
 
+def channel_search(vector_store, table_name, question, channels, k=5):
+    # The channel predicate runs inside the vector query, ahead of ORDER BY distance LIMIT k, so every
+    # one of the k results is on-channel. On TiDB it hits the indexed channel_name column that
+    # bot/tidb_addcontent_ytvideos.py adds; the local mirror and older tables use the metadata filter.
+    engine = store_engine(vector_store)
+    if engine is not None:
+        from langchain_core.documents import Document
+        from sqlalchemy import bindparam, text
+        from sqlalchemy.exc import DBAPIError
+        from tidb_vector.utils import encode_vector
+
+        query = text(
+            f"SELECT document, meta, VEC_COSINE_DISTANCE(embedding, :vector) AS distance "
+            f"FROM `{table_name}` WHERE channel_name IN :channels "
+            f"ORDER BY distance LIMIT :k"
+        ).bindparams(bindparam('channels', expanding=True))
+        vector = encode_vector(vector_store.embeddings.embed_query(question))
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(query, {'vector': vector, 'channels': list(channels), 'k': k}).fetchall()
+            return [Document(page_content=document, metadata=json.loads(meta) if isinstance(meta, str) else meta)
+                    for document, meta, _ in rows]
+        except DBAPIError as e:
+            logger.warning(f"channel_name column unavailable, filtering on metadata: {str(e)}")
+    return vector_store.similarity_search(question, k=k, filter={"channel_name": {"$in": list(channels)}})
+
+
 
 def create_nfl_fantasy_chatbot(question,nfl_fantasy_qa):
     try:
@@ -123,4 +133,57 @@ def split_response(response):
             references = ""  # Don't include generic reference messages
     else:
         references = ""
-    return content, references
\ No newline at end of file
+    return content, references
+
+
+REFERENCES_MARKER = "## References"
+
+class _TokenEvents:
+    # Turns LLM tokens into SSE 'token' events until the references marker shows up; the references are sent
+    # as one event once generation is done. Tail text that could be the start of the marker is held back.
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = 0
+        self.in_references = False
+
+    def feed(self, token):
+        self.buffer += token
+        if self.in_references:
+            return []
+        marker_at = self.buffer.find(REFERENCES_MARKER, max(0, self.emitted - len(REFERENCES_MARKER)))
+        if marker_at != -1:
+            safe = marker_at
+            self.in_references = True
+        else:
+            safe = len(self.buffer) - (len(REFERENCES_MARKER) - 1)
+        if safe <= self.emitted:
+            return []
+        event = f"data: {json.dumps({'token': self.buffer[self.emitted:safe]})}\n\n"
+        self.emitted = safe
+        return [event]
+
+    def finish(self, finalize=None):
+        events = []
+        if not self.in_references and len(self.buffer) > self.emitted:
+            events.append(f"data: {json.dumps({'token': self.buffer[self.emitted:]})}\n\n")
+        full_response = finalize(self.buffer) if finalize else self.buffer
+        _, references = split_response(full_response)
+        if references:
+            events.append(f"data: {json.dumps({'references': references})}\n\n")
+        return events
+
+
+def stream_sse_events(tokens, finalize=None):
+    events = _TokenEvents()
+    for token in tokens:
+        yield from events.feed(token)
+    yield from events.finish(finalize)
+
+
+async def astream_sse_events(tokens, finalize=None):
+    events = _TokenEvents()
+    async for token in tokens:
+        for event in events.feed(token):
+            yield event
+    for event in events.finish(finalize):
+        yield event
@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from answer_cache import ingest_generation
+from file_utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.join('data', '.cache', 'vectors')
+SYNC_BATCH_SIZE = 500
+
+
+def unit_vector(embedding):
+    # TiDB returns VECTOR columns as '[0.1,0.2,...]' text over a plain SQL query
+    if isinstance(embedding, (str, bytes)):
+        from tidb_vector.utils import decode_vector
+        embedding = decode_vector(embedding)
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def matches_filter(metadata, metadata_filter):
+    # Same operators TiDBVectorStore accepts in `filter`, evaluated against the local metadata
+    for key, condition in metadata_filter.items():
+        if key == '$and':
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for op, operand in condition.items():
+            if op == '$eq' and not value == operand:
+                return False
+            if op == '$ne' and not value != operand:
+                return False
+            if op == '$in' and value not in operand:
+                return False
+            if op == '$nin' and value in operand:
+                return False
+            if op in ('$gt', '$gte', '$lt', '$lte'):
+                if value is None:
+                    return False
+                if op == '$gt' and not value > operand:
+                    return False
+                if op == '$gte' and not value >= operand:
+                    return False
+                if op == '$lt' and not value < operand:
+                    return False
+                if op == '$lte' and not value <= operand:
+                    return False
+    return True
+
+
+class LocalVectorIndex(VectorStore):
+    # Read-only mirror of one TiDB vector table: unit-normalized float32 rows in a memory-mapped .npy,
+    # with documents and metadata alongside. Exact top-k is one matrix-vector product, which for a few
+    # thousand rows is far below a network round trip. TiDB stays the source of truth; sync() pulls
+    # only rows whose (id, update_time) changed.
+    def __init__(self, table_name: str, embedding: Embeddings, engine_factory: Optional[Callable] = None,
+                 index_dir: str = INDEX_DIR, sync_interval: float = 300):
+        self.table_name = table_name
+        self._embedding = embedding
+        self.engine_factory = engine_factory
+        self.path = os.path.join(index_dir, table_name)
+        self.sync_interval = sync_interval
+        # (vectors, ids, versions, documents, metadatas), swapped as a whole so searches never see a mix
+        self._state = (np.zeros((0, 0), dtype=np.float32), [], [], [], [])
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        self._generation = ingest_generation()
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self):
+        return len(self._state[1])
+
+    def _load(self):
+        manifest_path = os.path.join(self.path, 'rows.json')
+        if not os.path.exists(manifest_path):
+            return
+        try:
+            with open(manifest_path) as f:
+                rows = json.load(f)
+            vectors = np.load(os.path.join(self.path, f"vectors-{rows['revision']}.npy"), mmap_mode='r')
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring local index for {self.table_name}: {str(e)}")
+            return
+        if vectors.shape[0] != len(rows['ids']):
+            logger.warning(f"Local index for {self.table_name} is inconsistent; it will be rebuilt")
+            return
+        self._state = (vectors, rows['ids'], rows['versions'], rows['documents'], rows['metadatas'])
+        logger.info(f"Loaded local index for {self.table_name}: {len(rows['ids'])} rows")
+
+    def _save(self, vectors, ids, versions, documents, metadatas):
+        # Each revision gets its own vectors file, so a search still reading the old mmap is never truncated
+        os.makedirs(self.path, exist_ok=True)
+        revision = time.time_ns()
+        vectors_path = os.path.join(self.path, f"vectors-{revision}.npy")
+        np.save(vectors_path, vectors)
+        manifest_path = os.path.join(self.path, 'rows.json')
+        with atomic_write(manifest_path, 'w') as f:
+            json.dump({'revision': revision, 'ids': ids, 'versions': versions,
+                       'documents': documents, 'metadatas': metadatas}, f)
+        for name in os.listdir(self.path):
+            if name.startswith('vectors-') and name != os.path.basename(vectors_path):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        return np.load(vectors_path, mmap_mode='r')
+
+    def sync(self):
+        if self.engine_factory is None:
+            return 0
+        from sqlalchemy import bindparam, text
+
+        with self._sync_lock:
+            self._last_sync = time.time()
+            self._generation = ingest_generation()
+            engine = self.engine_factory()
+            with engine.connect() as conn:
+                remote = {row_id: str(updated) for row_id, updated in
+                          conn.execute(text(f"SELECT id, update_time FROM `{self.table_name}`"))}
+
+                vectors, ids, versions, documents, metadatas = self._state
+                local = dict(zip(ids, versions))
+                keep = [i for i, row_id in enumerate(ids) if remote.get(row_id) == versions[i]]
+                fetch = [row_id for row_id, version in remote.items() if local.get(row_id) != version]
+                if not fetch and len(keep) == len(ids):
+                    return 0
+
+                fetched = []
+                query = text(
+                    f"SELECT id, document, meta, embedding FROM `{self.table_name}` WHERE id IN :ids"
+                ).bindparams(bindparam('ids', expanding=True))
+                for start in range(0, len(fetch), SYNC_BATCH_SIZE):
+                    fetched.extend(conn.execute(query, {'ids': fetch[start:start + SYNC_BATCH_SIZE]}))
+
+            new_ids = [ids[i] for i in keep]
+            new_versions = [versions[i] for i in keep]
+            new_documents = [documents[i] for i in keep]
+            new_metadatas = [metadatas[i] for i in keep]
+            parts = [np.asarray(vectors[keep], dtype=np.float32)] if keep else []
+            for row_id, document, meta, embedding in fetched:
+                parts.append(unit_vector(embedding)[None, :])
+                new_ids.append(row_id)
+                new_versions.append(remote[row_id])
+                new_documents.append(document or '')
+                new_metadatas.append(json.loads(meta) if isinstance(meta, (str, bytes)) else (meta or {}))
+            merged = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+            state = (new_ids, new_versions, new_documents, new_metadatas)
+            self._state = (self._save(merged, *state), *state)
+            logger.info(f"Synced local index for {self.table_name}: {len(fetched)} fetched, "
+                        f"{len(ids) - len(keep)} replaced or removed, {len(state[0])} rows")
+            return len(fetched)
+
+    def sync_async(self):
+        def run():
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Local index sync failed for {self.table_name}: {str(e)}")
+        if not self._sync_lock.locked():
+            threading.Thread(target=run, name=f"sync-{self.table_name}", daemon=True).start()
+
+    def _maybe_sync(self):
+        # Searches never wait on TiDB once rows exist; stale mirrors refresh in the background
+        if self.engine_factory is None:
+            return
+        if not len(self) and not self._last_sync:
+            self.sync()
+        elif time.time() - self._last_sync > self.sync_interval or ingest_generation() != self._generation:
+            self.sync_async()
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        self._maybe_sync()
+        vectors, ids, _, documents, metadatas = self._state
+        if not ids:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        similarities = vectors @ (query / norm if norm else query)
+        if filter:
+            allowed = np.fromiter((matches_filter(meta, filter) for meta in metadatas), dtype=bool, count=len(ids))
+            similarities = np.where(allowed, similarities, -np.inf)
+            k = min(k, int(allowed.sum()))
+        k = min(k, len(ids))
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        # Cosine distance, the same score TiDBVectorStore returns
+        return [(Document(page_content=documents[i], metadata=metadatas[i]), float(1 - similarities[i]))
+                for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None,
+                                    **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda distance: 1 - distance
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("LocalVectorIndex is a read-only mirror; ingest into TiDB and sync()")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   **kwargs: Any) -> "LocalVectorIndex":
+        raise NotImplementedError("LocalVectorIndex is a read-only mirror; ingest into TiDB and sync()")